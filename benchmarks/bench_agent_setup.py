@@ -0,0 +1,98 @@
+"""Microbenchmark: per-turn agent setup cost, rebuilt every turn vs built once per config entry.
+
+Before, every `async_process` built the LLM client, the prompt template, the agent runnable and the
+AgentExecutor. Now those are built at setup and a turn only assembles its input variables.
+
+Run from the repository root (needs the integration requirements and homeassistant installed):
+
+    python benchmarks/bench_agent_setup.py [--turns 200] [--model-type OpenAI]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.llm_conversation_assist.const import (
+    DEFAULT_HUMAN_PROMPT,
+    MODEL_OPENAI,
+    OPENAI_AGENT_HUMAN_PROMPT,
+    STRUCTURED_AGENT_HUMAN_PROMPT,
+)
+from custom_components.llm_conversation_assist.ha_service import HaService
+from custom_components.llm_conversation_assist.langchain_tools.agent_chain import (
+    SYSTEM_PROMPT_KEY,
+    build_agent_executor,
+    get_agent_system_prompt,
+)
+from custom_components.llm_conversation_assist.langchain_tools.ha_tools import HAServiceCallToolkit
+
+
+def _get_llm():
+    from langchain_openai import ChatOpenAI
+    # Never called over the network, only constructed
+    return ChatOpenAI(model_name="gpt-3.5-turbo", openai_api_key="sk-bench", openai_api_base="http://127.0.0.1:9/v1")
+
+
+def _human_prompt(model_type):
+    agent_human_prompt = OPENAI_AGENT_HUMAN_PROMPT if model_type == MODEL_OPENAI else STRUCTURED_AGENT_HUMAN_PROMPT
+    # Same result as rendering DEFAULT_HUMAN_PROMPT through the HA template engine
+    return DEFAULT_HUMAN_PROMPT.replace("{{agent_human_prompt}}", agent_human_prompt)
+
+
+def per_turn_rebuild(tools, model_type):
+    """What every turn paid before: build everything, then assemble the input."""
+    agent_chain = build_agent_executor(
+        llm=_get_llm(),
+        tools=tools,
+        model_type=model_type,
+        human_prompt=_human_prompt(model_type),
+        max_iterations=5,
+    )
+    return agent_chain, {"input": "turn on the light", SYSTEM_PROMPT_KEY: "system prompt"}
+
+
+def per_turn_cached(agent_chain):
+    """What a turn pays now: the pipeline is already built."""
+    return agent_chain, {"input": "turn on the light", SYSTEM_PROMPT_KEY: "system prompt"}
+
+
+def _report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<10} mean {statistics.mean(samples) * 1e3:9.3f} ms   "
+          f"p50 {statistics.median(samples) * 1e3:9.3f} ms   p95 {p95 * 1e3:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--model-type", default=MODEL_OPENAI)
+    args = parser.parse_args()
+
+    tools = HAServiceCallToolkit(HaService(None)).get_tools()
+    get_agent_system_prompt(args.model_type, tools)
+
+    before = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        per_turn_rebuild(tools, args.model_type)
+        before.append(time.perf_counter() - start)
+
+    cached_chain, _ = per_turn_rebuild(tools, args.model_type)
+    after = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        per_turn_cached(cached_chain)
+        after.append(time.perf_counter() - start)
+
+    print(f"per-turn agent setup, {args.turns} turns, model type {args.model_type}")
+    _report("before", before)
+    _report("after", after)
+    print(f"saved per turn: {(statistics.mean(before) - statistics.mean(after)) * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""End-to-end turn latency, per stage, allocations and prompt tokens, fully offline.
+
+A synthetic hass is filled with areas, devices, entities, automations and scripts (see
+synthetic_hass.py) and the agent is set up with ScriptedChatModel, which answers every
+"turn on <name>" with search_exposed_entities, call_homeassistant_service and a final answer.
+The LLM itself takes no time, so the numbers are the integration's own overhead per turn.
+
+Stages:
+  system_prompt   rendering the system prompt template
+  llm             each call of the (fake) chat model, including prompt formatting by langchain
+  tool:<name>     each tool run
+  turn            the whole async_process
+
+Allocations are measured in a second pass with tracemalloc, which slows everything down.
+
+Run from the repository root (needs homeassistant and the integration requirements installed):
+
+    python benchmarks/bench_e2e.py [--entities 100 1000 10000] [--turns 50] [--option fast_path=true]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain.callbacks.base import AsyncCallbackHandler
+
+from custom_components.llm_conversation_assist.agent import LLMConversationAssistAgent
+from synthetic_hass import (
+    DOMAINS,
+    PROMPT_TOKENS,
+    ScriptedChatModel,
+    async_create_hass,
+    conversation_input,
+    create_config_entry,
+    entity_name,
+)
+
+# Turns per conversation before a new conversation_id is used, so the chat history stays realistic
+TURNS_PER_CONVERSATION = 5
+
+
+class StageTimer(AsyncCallbackHandler):
+    """Durations of the llm calls and tool runs of the agent."""
+
+    def __init__(self, stages: dict[str, list[float]]):
+        self.stages = stages
+        self._starts: dict[Any, tuple[str, float]] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._starts[run_id] = ("llm", time.perf_counter())
+
+    async def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._stop(run_id)
+
+    async def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._starts[run_id] = (f"tool:{serialized.get('name')}", time.perf_counter())
+
+    async def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._stop(run_id)
+
+    def _stop(self, run_id) -> None:
+        if (start := self._starts.pop(run_id, None)) is not None:
+            stage, started = start
+            self.stages[stage].append(time.perf_counter() - started)
+
+
+class TimedChain:
+    """The agent chain with a StageTimer added to the callbacks of every run.
+
+    Callbacks set on the chain itself only see the chain's own events, the ones passed in the
+    config are inherited by every llm call and tool run.
+    """
+
+    def __init__(self, chain, timer: StageTimer):
+        self.chain = chain
+        self.timer = timer
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        config = dict(config or {})
+        config["callbacks"] = [*(config.get("callbacks") or []), self.timer]
+        return await self.chain.ainvoke(inputs, config, **kwargs)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, round(q * len(samples)) - 1))]
+
+
+def _utterance(turn: int, entities: int) -> str:
+    # Only lights are targeted, every len(DOMAINS)-th entity is one
+    lights = max(1, entities // len(DOMAINS))
+    return f"turn on {entity_name('light', (turn % lights) * len(DOMAINS))}"
+
+
+async def _async_setup_agent(entities: int, options: dict[str, Any]) -> LLMConversationAssistAgent:
+    hass = await async_create_hass(entities)
+    agent = LLMConversationAssistAgent(hass, create_config_entry(options), ScriptedChatModel)
+    await agent.async_build_agent_chain()
+    await agent.async_setup()
+    return agent
+
+
+def _time_system_prompt(agent: LLMConversationAssistAgent, stages: dict[str, list[float]]) -> None:
+    generate = agent._async_generate_system_prompt
+
+    def timed(*args):
+        start = time.perf_counter()
+        try:
+            return generate(*args)
+        finally:
+            stages["system_prompt"].append(time.perf_counter() - start)
+
+    agent._async_generate_system_prompt = timed
+
+
+async def _async_run_turns(agent: LLMConversationAssistAgent, entities: int, turns: int,
+                           stages: dict[str, list[float]] | None = None, peaks: list[int] | None = None) -> None:
+    conversation_id = None
+    for turn in range(turns):
+        if turn % TURNS_PER_CONVERSATION == 0:
+            conversation_id = None
+        if peaks is not None:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = await agent.async_process(conversation_input(_utterance(turn, entities), conversation_id))
+        elapsed = time.perf_counter() - start
+        conversation_id = result.conversation_id
+        if stages is not None:
+            stages["turn"].append(elapsed)
+        if peaks is not None:
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+
+
+async def async_bench(entities: int, turns: int, options: dict[str, Any]) -> dict[str, Any]:
+    agent = await _async_setup_agent(entities, options)
+    try:
+        # Warm up caches and lazy imports, like a running instance would be
+        await _async_run_turns(agent, entities, TURNS_PER_CONVERSATION)
+
+        stages: dict[str, list[float]] = defaultdict(list)
+        chain = agent.agent_chain
+        agent.agent_chain = TimedChain(chain, StageTimer(stages))
+        _time_system_prompt(agent, stages)
+        PROMPT_TOKENS.clear()
+        await _async_run_turns(agent, entities, turns, stages=stages)
+        llm_calls = list(PROMPT_TOKENS)
+
+        peaks: list[int] = []
+        agent.agent_chain = chain
+        # Back to the method of the class
+        del agent._async_generate_system_prompt
+        tracemalloc.start()
+        try:
+            await _async_run_turns(agent, entities, max(1, turns // 5), peaks=peaks)
+        finally:
+            tracemalloc.stop()
+    finally:
+        await agent.async_unload()
+        await agent.async_close()
+        await agent.hass.async_stop(force=True)
+
+    return {
+        "entities": entities,
+        "turns": turns,
+        "stages": {
+            stage: {q: percentile(samples, value) * 1e3 for q, value in (("p50", .5), ("p95", .95), ("p99", .99))}
+            for stage, samples in sorted(stages.items())
+        },
+        "calls_per_turn": {stage: len(samples) / turns for stage, samples in sorted(stages.items())},
+        "peak_alloc_kib": {"p50": percentile(peaks, .5) / 1024, "p95": percentile(peaks, .95) / 1024},
+        "prompt_tokens": {
+            "per_llm_call_p50": percentile(llm_calls, .5) if llm_calls else 0,
+            "per_turn": sum(llm_calls) / turns,
+        },
+    }
+
+
+def _report(result: dict[str, Any]) -> None:
+    print(f"\n{result['entities']} entities, {result['turns']} turns")
+    print(f"{'stage':<40} {'calls':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, values in result["stages"].items():
+        print(f"{stage:<40} {result['calls_per_turn'][stage]:>6.1f} "
+              f"{values['p50']:>10.3f} {values['p95']:>10.3f} {values['p99']:>10.3f}")
+    print(f"peak allocations per turn: p50 {result['peak_alloc_kib']['p50']:.1f} KiB, "
+          f"p95 {result['peak_alloc_kib']['p95']:.1f} KiB")
+    print(f"prompt tokens: p50 {result['prompt_tokens']['per_llm_call_p50']} per llm call, "
+          f"{result['prompt_tokens']['per_turn']:.0f} per turn")
+
+
+def _parse_option(value: str) -> tuple[str, Any]:
+    key, _, raw = value.partition("=")
+    return key, json.loads(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--option", type=_parse_option, action="append", default=[],
+                        help="integration option as key=json, e.g. langchain_memory_mode=\"token_budget\"")
+    parser.add_argument("--json", action="store_true", help="print the results as json")
+    args = parser.parse_args()
+
+    results = [asyncio.run(async_bench(entities, args.turns, dict(args.option))) for entities in args.entities]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        _report(result)
+
+
+if __name__ == "__main__":
+    main()
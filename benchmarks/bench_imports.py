@@ -0,0 +1,75 @@
+"""Import-time measurement: what blocks the event loop at startup and on the first response.
+
+Before, loading the integration imported langchain eagerly, and the first turn imported the provider
+sdk (openai, dashscope or qianfan) inside the event loop. Now the integration module only imports
+Home Assistant code; langchain and the selected provider's sdk are imported in the executor during
+async_setup_entry, and nothing is imported on the first turn.
+
+Every import is measured in a fresh interpreter. Run from the repository root:
+
+    python benchmarks/bench_imports.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PACKAGE = "custom_components.llm_conversation_assist"
+
+PROVIDERS = {
+    "OpenAI": "from langchain_openai import ChatOpenAI",
+    "Tongyi": "from langchain_community.llms import Tongyi",
+    "Qianfan": "from langchain_community.chat_models import QianfanChatEndpoint",
+}
+
+
+def _measure(setup: str, statement: str, runs: int) -> float:
+    """Median seconds spent importing statement, after setup, in fresh interpreters."""
+    code = (
+        "import time\n"
+        f"{setup}\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    ha_setup = "import homeassistant.components.conversation, homeassistant.helpers.template"
+    integration = _measure(ha_setup, f"import {PACKAGE}", args.runs)
+    agent = _measure(f"{ha_setup}\nimport {PACKAGE}", f"import {PACKAGE}.agent", args.runs)
+
+    print(f"integration module (event loop, startup): {integration * 1e3:9.1f} ms")
+    print(f"langchain agent modules (executor):       {agent * 1e3:9.1f} ms")
+    for model_type, statement in PROVIDERS.items():
+        try:
+            provider = _measure(f"{ha_setup}\nimport {PACKAGE}.agent", statement, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{model_type:<8} sdk not installed")
+            continue
+        # What is left for the event loop once setup imported the agent and sdk in the executor
+        first_response = _measure(
+            f"{ha_setup}\nimport {PACKAGE}.agent\n{statement}", f"import {PACKAGE}.agent\n{statement}", args.runs
+        )
+        print(f"{model_type:<8} sdk (executor):  {provider * 1e3:9.1f} ms")
+        print(f"  before: {(integration + agent) * 1e3:9.1f} ms on the event loop at startup, "
+              f"{provider * 1e3:9.1f} ms on the event loop in the first response")
+        print(f"  after:  {integration * 1e3:9.1f} ms on the event loop at startup, "
+              f"{first_response * 1e3:9.1f} ms on the event loop in the first response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Concurrent voice satellites against a local OpenAI compatible mock server.
+
+Every satellite runs its own conversation (distinct conversation_id) and sends its turns one after
+the other, all satellites at the same time. The agent uses the real ChatOpenAI client with the
+integration's pooled http client, pointed at mock_openai_server.py, which runs in a thread with
+its own event loop so that it does not disturb the loop being measured.
+
+Reported per number of satellites:
+  throughput          turns per second
+  latency             p50/p95/p99 of a whole turn
+  loop lag            how late a 10 ms timer fires on Home Assistant's loop, p50/p99/max
+  connection reuse    llm requests per tcp connection opened to the server
+
+Run from the repository root (needs homeassistant, aiohttp and the integration requirements installed):
+
+    python benchmarks/bench_load.py [--satellites 10 20 50] [--turns 5] [--latency 300] [--stream]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from custom_components.llm_conversation_assist.agent import LLMConversationAssistAgent
+from custom_components.llm_conversation_assist.const import (
+    CONF_HTTP_POOL_SIZE,
+    CONF_STREAM_RESPONSE,
+    MODEL_OPENAI,
+)
+from custom_components.llm_conversation_assist.langchain_tools.llm_models import load_llm_class
+from mock_openai_server import MockOpenAIServer, async_start_server
+from synthetic_hass import (
+    DOMAINS,
+    async_create_hass,
+    conversation_input,
+    create_config_entry,
+    entity_name,
+)
+
+LAG_INTERVAL = 0.01
+
+
+def percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, round(q * len(samples)) - 1))]
+
+
+def start_mock_server(port: int, latency: float, chunk_delay: float) -> MockOpenAIServer:
+    """Serve from a daemon thread with its own event loop."""
+    started = threading.Event()
+    holder: list[MockOpenAIServer] = []
+
+    def run() -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server, _ = loop.run_until_complete(async_start_server("127.0.0.1", port, latency, chunk_delay))
+        holder.append(server)
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="mock-openai-server", daemon=True).start()
+    started.wait()
+    return holder[0]
+
+
+async def _monitor_loop_lag(samples: list[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(loop.time() - start - LAG_INTERVAL)
+
+
+async def _satellite(agent: LLMConversationAssistAgent, satellite: int, turns: int, entities: int,
+                     latencies: list[float], errors: list[str]) -> None:
+    lights = max(1, entities // len(DOMAINS))
+    conversation_id = None
+    for turn in range(turns):
+        text = f"turn on {entity_name('light', ((satellite * turns + turn) % lights) * len(DOMAINS))}"
+        start = time.perf_counter()
+        result = await agent.async_process(conversation_input(text, conversation_id))
+        latencies.append(time.perf_counter() - start)
+        conversation_id = result.conversation_id
+        if result.response.error_code is not None:
+            errors.append(result.response.speech["plain"]["speech"])
+
+
+async def async_bench(args: argparse.Namespace, server: MockOpenAIServer) -> list[dict[str, Any]]:
+    hass = await async_create_hass(args.entities)
+    options = {CONF_STREAM_RESPONSE: args.stream, CONF_HTTP_POOL_SIZE: args.pool_size}
+    entry = create_config_entry(options, base_url=f"http://127.0.0.1:{args.port}/v1")
+    llm_class = await hass.async_add_executor_job(load_llm_class, MODEL_OPENAI)
+    agent = LLMConversationAssistAgent(hass, entry, llm_class)
+    await agent.async_build_agent_chain()
+    await agent.async_setup()
+
+    results = []
+    try:
+        for satellites in args.satellites:
+            latencies: list[float] = []
+            errors: list[str] = []
+            lags: list[float] = []
+            requests, connections = server.requests, server.connections
+            monitor = asyncio.create_task(_monitor_loop_lag(lags))
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                _satellite(agent, satellite, args.turns, args.entities, latencies, errors)
+                for satellite in range(satellites)
+            ))
+            wall = time.perf_counter() - start
+            monitor.cancel()
+
+            new_requests = server.requests - requests
+            new_connections = server.connections - connections
+            results.append({
+                "satellites": satellites,
+                "turns": len(latencies),
+                "errors": len(errors),
+                "throughput": len(latencies) / wall,
+                "latency_ms": {q: percentile(latencies, value) * 1e3
+                               for q, value in (("p50", .5), ("p95", .95), ("p99", .99))},
+                "loop_lag_ms": {
+                    "p50": percentile(lags, .5) * 1e3,
+                    "p99": percentile(lags, .99) * 1e3,
+                    "max": max(lags) * 1e3,
+                } if lags else {},
+                "llm_requests": new_requests,
+                "new_connections": new_connections,
+                "requests_per_connection": new_requests / new_connections if new_connections else float(new_requests),
+            })
+    finally:
+        await agent.async_unload()
+        await agent.async_close()
+        await hass.async_stop(force=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--satellites", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--turns", type=int, default=5, help="turns per satellite")
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=300, help="ms the mock llm takes to answer")
+    parser.add_argument("--chunk-delay", type=float, default=20, help="ms between streamed chunks")
+    parser.add_argument("--stream", action="store_true", help="enable the stream response option")
+    parser.add_argument("--pool-size", type=int, default=10, help="http_pool_size option")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = start_mock_server(args.port, args.latency / 1e3, args.chunk_delay / 1e3)
+    results = asyncio.run(async_bench(args, server))
+
+    print(f"{args.entities} entities, mock latency {args.latency:.0f} ms, stream {args.stream}, "
+          f"pool size {args.pool_size}")
+    print(f"{'satellites':>10} {'turns/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'lag p99':>8} {'lag max':>8} {'req/conn':>9} {'errors':>7}")
+    for result in results:
+        print(f"{result['satellites']:>10} {result['throughput']:>8.2f} "
+              f"{result['latency_ms']['p50']:>9.1f} {result['latency_ms']['p95']:>9.1f} "
+              f"{result['latency_ms']['p99']:>9.1f} {result['loop_lag_ms'].get('p99', 0):>8.2f} "
+              f"{result['loop_lag_ms'].get('max', 0):>8.2f} {result['requests_per_connection']:>9.1f} "
+              f"{result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
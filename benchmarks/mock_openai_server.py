@@ -0,0 +1,160 @@
+"""Local stand-in for an OpenAI compatible chat completions api, for load tests without a provider.
+
+Answers every "turn on <name>" conversation with the steps of scripted_step (search the entity,
+call the service, final answer), after a configurable latency, streamed or not as requested.
+GET /stats returns the number of requests and of distinct client connections, to see whether
+the integration reuses its connections.
+
+Needs only aiohttp. Run standalone and point the integration's base url at it:
+
+    python benchmarks/mock_openai_server.py [--port 8765] [--latency 300] [--chunk-delay 20]
+
+or start it in-process with async_start_server, see bench_load.py.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+from aiohttp import web
+
+
+def entity_id_of(domain: str, index: int) -> str:
+    return f"{domain}.{domain}_{index}"
+
+
+def scripted_step(utterance: str, steps: int) -> tuple[str, dict[str, Any]] | str:
+    """The tool call (name, arguments) to make after the given number of steps, or the final answer."""
+    # The human prompt may add lines after the utterance
+    target = utterance.strip().splitlines()[0].rsplit("turn on ", 1)[-1].strip(" .")
+    if steps == 0:
+        return "search_exposed_entities", {"query": target}
+    if steps == 1:
+        domain, _, index = target.lower().rpartition(" ")
+        domain = domain.replace(" ", "_")
+        return "call_homeassistant_service", {
+            "domain": domain,
+            "service": "turn_on",
+            "service_data": {"entity_id": entity_id_of(domain, int(index))},
+        }
+    return f"{target} is on now."
+
+
+class MockOpenAIServer:
+    def __init__(self, latency: float, chunk_delay: float):
+        # Seconds before the answer, and between streamed chunks
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self._connections: set[Any] = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self._connections)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_chat_completions)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"requests": self.requests, "connections": self.connections})
+
+    async def handle_chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        # One peer address per tcp connection, a reused keep-alive connection keeps its port
+        self._connections.add(request.transport.get_extra_info("peername") if request.transport else None)
+        body = await request.json()
+        messages = body["messages"]
+        last_user = max(index for index, message in enumerate(messages) if message["role"] == "user")
+        steps = sum(
+            1 for message in messages[last_user:]
+            if message["role"] == "assistant" and message.get("tool_calls")
+        )
+        step = scripted_step(messages[last_user]["content"], steps)
+        prompt_tokens = len(json.dumps(messages)) // 4
+
+        await asyncio.sleep(self.latency)
+        if body.get("stream"):
+            return await self._stream(request, body, step)
+
+        if isinstance(step, str):
+            message = {"role": "assistant", "content": step}
+            finish_reason = "stop"
+        else:
+            message = {"role": "assistant", "content": None, "tool_calls": [_tool_call(*step)]}
+            finish_reason = "tool_calls"
+        return web.json_response({
+            "id": f"chatcmpl-mock-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+        })
+
+    async def _stream(self, request: web.Request, body: dict[str, Any], step) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(delta: dict[str, Any], finish_reason: str | None = None) -> None:
+            chunk = {
+                "id": f"chatcmpl-mock-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        await send({"role": "assistant", "content": ""})
+        if isinstance(step, str):
+            for word in step.split(" "):
+                await asyncio.sleep(self.chunk_delay)
+                await send({"content": f"{word} "})
+            await send({}, "stop")
+        else:
+            tool_call = _tool_call(*step)
+            arguments = tool_call["function"]["arguments"]
+            await send({"tool_calls": [{
+                "index": 0, "id": tool_call["id"], "type": "function",
+                "function": {"name": tool_call["function"]["name"], "arguments": ""},
+            }]})
+            for start in range(0, len(arguments), 16):
+                await asyncio.sleep(self.chunk_delay)
+                await send({"tool_calls": [{"index": 0, "function": {"arguments": arguments[start:start + 16]}}]})
+            await send({}, "tool_calls")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+def _tool_call(name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+    return {"id": f"call_{name}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+async def async_start_server(host: str, port: int, latency: float, chunk_delay: float):
+    """Start serving in the running loop, returns the server and the runner to clean up."""
+    server = MockOpenAIServer(latency, chunk_delay)
+    runner = web.AppRunner(server.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return server, runner
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=300, help="ms before the answer")
+    parser.add_argument("--chunk-delay", type=float, default=20, help="ms between streamed chunks")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(args.latency / 1e3, args.chunk_delay / 1e3)
+    web.run_app(server.create_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Offline Home Assistant instance filled with synthetic areas, devices, entities, automations and scripts.
+
+Shared by the end-to-end benchmarks. Nothing here talks to the network: the agent is created with
+ScriptedChatModel, which answers with predefined tool calls, or with ChatOpenAI pointed at the
+local mock server in mock_openai_server.py.
+
+Written against Home Assistant 2024.x and langchain 0.1; needs both installed.
+"""
+import json
+import os
+import tempfile
+from typing import Any, Optional
+
+from homeassistant.components import conversation
+from homeassistant.components.homeassistant.exposed_entities import (
+    DATA_EXPOSED_ENTITIES,
+    ExposedEntities,
+    async_expose_entity,
+)
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import Context, HomeAssistant, ServiceCall
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity_registry as er,
+)
+from homeassistant.util.yaml import dump
+from langchain.chat_models.base import BaseChatModel
+from langchain.schema import ChatGeneration, ChatResult
+from langchain.schema.messages import AIMessage, BaseMessage, HumanMessage
+
+from custom_components.llm_conversation_assist.const import (
+    CONF_BASE_URL,
+    CONF_CHAT_MODEL,
+    CONF_MODEL_TYPE,
+    DOMAIN,
+    MODEL_OPENAI,
+)
+from custom_components.llm_conversation_assist.config_flow import (
+    DEFAULT_COMMON_OPTIONS,
+    DEFAULT_OPENAI_OPTIONS,
+)
+from custom_components.llm_conversation_assist.langchain_tools.memory import count_message_tokens
+from mock_openai_server import entity_id_of, scripted_step
+
+# Prompt token estimate of every ScriptedChatModel call, collected by the benchmarks
+PROMPT_TOKENS: list[int] = []
+
+# Entity domains cycled through by the generator, with a no-op service for each of their actions
+DOMAINS = {
+    "light": ["turn_on", "turn_off", "toggle"],
+    "switch": ["turn_on", "turn_off", "toggle"],
+    "fan": ["turn_on", "turn_off"],
+    "cover": ["open_cover", "close_cover"],
+    "sensor": [],
+    "binary_sensor": [],
+}
+
+
+def entity_name(domain: str, index: int) -> str:
+    return f"{domain.replace('_', ' ').title()} {index}"
+
+
+async def async_create_hass(
+        entities: int,
+        areas: Optional[int] = None,
+        devices: Optional[int] = None,
+        automations: Optional[int] = None,
+        scripts: Optional[int] = None,
+        config_dir: Optional[str] = None,
+) -> HomeAssistant:
+    """A hass with the registries, exposure settings and config files of a home of the given size."""
+    areas = max(1, entities // 20) if areas is None else areas
+    devices = entities // 3 if devices is None else devices
+    automations = entities // 10 if automations is None else automations
+    scripts = entities // 20 if scripts is None else scripts
+
+    hass = HomeAssistant(config_dir or tempfile.mkdtemp(prefix="llm_assist_bench_"))
+    hass.config.location_name = "Bench Home"
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    exposed_entities = ExposedEntities(hass)
+    await exposed_entities.async_initialize()
+    hass.data[DATA_EXPOSED_ENTITIES] = exposed_entities
+
+    for domain, services in DOMAINS.items():
+        for service in services:
+            hass.services.async_register(domain, service, _async_noop_service)
+
+    # A bare HomeAssistant has no config entries manager, bootstrap creates it
+    hass.config_entries = ConfigEntries(hass, {})
+    # Devices need an existing config entry; there is no public way to register one without setting it up
+    device_entry = ConfigEntry(
+        version=1, minor_version=1, domain="bench", title="bench", data={}, source="user", options={}
+    )
+    hass.config_entries._entries[device_entry.entry_id] = device_entry
+
+    area_reg = ar.async_get(hass)
+    dev_reg = dr.async_get(hass)
+    ent_reg = er.async_get(hass)
+    area_ids = [area_reg.async_create(f"Area {index}", aliases={f"Room {index}"}).id for index in range(areas)]
+    device_ids = [
+        dev_reg.async_get_or_create(
+            config_entry_id=device_entry.entry_id,
+            identifiers={("bench", str(index))},
+            name=f"Device {index}",
+            suggested_area=f"Area {index % areas}" if areas else None,
+        ).id
+        for index in range(devices)
+    ]
+
+    domains = list(DOMAINS)
+    for index in range(entities):
+        domain = domains[index % len(domains)]
+        entry = ent_reg.async_get_or_create(
+            domain, "bench", f"{domain}_{index}",
+            suggested_object_id=f"{domain}_{index}",
+            device_id=device_ids[index % len(device_ids)] if device_ids else None,
+        )
+        # Every other entity has its own area, the others inherit the area of their device
+        if index % 2 and area_ids:
+            ent_reg.async_update_entity(
+                entry.entity_id, area_id=area_ids[index % len(area_ids)], aliases={f"{domain} number {index}"}
+            )
+        hass.states.async_set(entry.entity_id, "off", {"friendly_name": entity_name(domain, index)})
+        async_expose_entity(hass, conversation.DOMAIN, entry.entity_id, True)
+
+    await hass.async_add_executor_job(_write_config_files, hass.config.config_dir, automations, scripts)
+    await hass.async_block_till_done()
+    return hass
+
+
+async def _async_noop_service(call: ServiceCall) -> None:
+    return None
+
+
+def _write_config_files(config_dir: str, automations: int, scripts: int) -> None:
+    automation_items = [
+        {
+            "id": str(index),
+            "alias": f"Automation {index}",
+            "trigger": [{"platform": "time", "at": f"{index % 24:02d}:00:00"}],
+            "action": [{"service": "light.turn_on", "target": {"entity_id": entity_id_of("light", index * 6)}}],
+        }
+        for index in range(automations)
+    ]
+    script_items = {
+        f"script_{index}": {
+            "alias": f"Script {index}",
+            "description": f"Turn off everything in area {index}",
+            "sequence": [{"service": "light.turn_off", "target": {"area_id": f"area_{index}"}}],
+        }
+        for index in range(scripts)
+    }
+    for name, data in (("automations.yaml", automation_items), ("scripts.yaml", script_items),
+                       ("scenes.yaml", [])):
+        with open(os.path.join(config_dir, name), "w", encoding="utf-8") as file:
+            file.write(dump(data))
+
+
+def create_config_entry(options: Optional[dict[str, Any]] = None, base_url: str = "http://127.0.0.1:9/v1") -> ConfigEntry:
+    """An OpenAI config entry of the integration with the default options, not added to hass."""
+    return ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="bench",
+        data={
+            CONF_MODEL_TYPE: MODEL_OPENAI,
+            CONF_API_KEY: "sk-bench",
+            CONF_CHAT_MODEL: "gpt-3.5-turbo",
+            CONF_BASE_URL: base_url,
+        },
+        source="user",
+        options={**DEFAULT_COMMON_OPTIONS, **DEFAULT_OPENAI_OPTIONS, **(options or {})},
+    )
+
+
+def conversation_input(text: str, conversation_id: Optional[str]) -> conversation.ConversationInput:
+    return conversation.ConversationInput(
+        text=text, context=Context(), conversation_id=conversation_id, device_id=None, language="en"
+    )
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model answering "turn on <name>" with the steps of scripted_step: search_exposed_entities,
+    call_homeassistant_service, then a final answer, in the OpenAI tool call format.
+
+    Accepts the arguments the agent passes to ChatOpenAI. The prompt token estimate of every call
+    is appended to PROMPT_TOKENS.
+    """
+
+    model_name: str = "scripted"
+    openai_api_key: Any = None
+    openai_api_base: Any = None
+    temperature: Any = None
+    max_tokens: Any = None
+    streaming: bool = False
+    http_async_client: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        PROMPT_TOKENS.append(count_message_tokens(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # The default runs _generate in the executor, which would add a thread hop to every step
+        return self._generate(messages, stop, run_manager, **kwargs)
+
+    def _next_message(self, messages: list[BaseMessage]) -> AIMessage:
+        last_human = max(index for index, message in enumerate(messages) if isinstance(message, HumanMessage))
+        steps = sum(
+            1 for message in messages[last_human:]
+            if isinstance(message, AIMessage) and message.additional_kwargs.get("tool_calls")
+        )
+        step = scripted_step(messages[last_human].content, steps)
+        if isinstance(step, str):
+            return AIMessage(content=step)
+        return _tool_call_message(*step)
+
+
+def _tool_call_message(name: str, arguments: dict[str, Any]) -> AIMessage:
+    return AIMessage(content="", additional_kwargs={"tool_calls": [{
+        "id": f"call_{name}",
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(arguments)},
+    }]})
@@ -0,0 +1,487 @@
+"""Conversation agent backed by a LangChain agent."""
+from __future__ import annotations
+
+import importlib
+import logging
+import time
+from typing import TYPE_CHECKING, Literal
+
+import httpx
+
+from langchain.memory import ConversationBufferWindowMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.chat_models.base import BaseChatModel
+
+from homeassistant.components import conversation
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY, MATCH_ALL
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import intent, template
+from homeassistant.helpers.httpx_client import KEEP_ALIVE_TIMEOUT, SERVER_SOFTWARE, USER_AGENT
+from homeassistant.util import dt as dt_util
+from homeassistant.util.ssl import client_context
+from homeassistant.exceptions import (
+    ConfigEntryNotReady,
+    HomeAssistantError,
+)
+
+from .const import *
+
+from .langchain_tools.ha_tools import (
+    HAServiceCallToolkit
+)
+from .langchain_tools.memory import (
+    ConversationTokenBudgetMemory,
+    count_message_tokens
+)
+from .langchain_tools.streaming import FinalAnswerStreamHandler
+from .langchain_tools.tracing import TouchedEntitiesRecorder, TraceBuffer, TurnTracer
+from .langchain_tools.agent_chain import (
+    SYSTEM_PROMPT_KEY,
+    build_agent_executor,
+    get_agent_system_prompt
+)
+
+from .answer_cache import AnswerCache
+from .conversation_store import ConversationStore
+from .ha_service import HaService
+from .intent_matcher import FastPathMatcher
+from .metrics import Metrics
+from .prompt import build_render_context
+
+if TYPE_CHECKING:
+    from .semantic_retrieval import SemanticRetrieval
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LLMConversationAssistAgent(conversation.AbstractConversationAgent):
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, llm_class) -> None:
+        self.hass = hass
+        self.entry = entry
+        # Imported in the executor at setup, see load_llm_class
+        self.llm_class = llm_class
+
+        self.conversations = ConversationStore(
+            self._create_memory, CONVERSATION_MAX_COUNT, CONVERSATION_IDLE_TIMEOUT
+        )
+        self.metrics = Metrics()
+        self.traces = TraceBuffer()
+        self.ha_service = HaService(self.hass, self.metrics)
+        self.toolkit = HAServiceCallToolkit(self.ha_service)
+        self.tools = self.toolkit.get_tools()
+        self.fast_path = FastPathMatcher(self.ha_service)
+        self.answer_cache = AnswerCache(self.hass, ANSWER_CACHE_SIZE, ANSWER_CACHE_MAX_AGE)
+        self.retrieval: SemanticRetrieval | None = None
+        self.agent_system_prompt = ""
+        self.system_prompt_template: template.Template | None = None
+        self._human_prompt_cache: tuple[tuple[str, str], str] | None = None
+        self.agent_chain = None
+        self.stream_response = False
+        self.http_client: httpx.AsyncClient | None = None
+        self._http_client_settings: tuple[int, float] | None = None
+
+    async def async_build_agent_chain(self) -> None:
+        """Build the agent pipeline once, it is reused by every turn until the options change."""
+        self._update_memories()
+        # Answers of the previous prompts and model
+        self.answer_cache.clear()
+
+        model_type = self.entry.data.get(CONF_MODEL_TYPE)
+        if model_type == MODEL_OPENAI:
+            agent_human_prompt = OPENAI_AGENT_HUMAN_PROMPT
+        else:
+            agent_human_prompt = STRUCTURED_AGENT_HUMAN_PROMPT
+        raw_human_prompt = self.entry.options.get(CONF_HUMAN_PROMPT, DEFAULT_HUMAN_PROMPT)
+        # The human prompt has no per-turn inputs, render it only when its source changes
+        human_prompt_key = (raw_human_prompt, agent_human_prompt)
+        if self._human_prompt_cache is None or self._human_prompt_cache[0] != human_prompt_key:
+            self._human_prompt_cache = (
+                human_prompt_key, self._async_generate_human_prompt(raw_human_prompt, agent_human_prompt)
+            )
+        human_prompt = self._human_prompt_cache[1]
+        _LOGGER.debug("Using human prompt: %s", human_prompt)
+
+        self.agent_system_prompt = get_agent_system_prompt(model_type, self.tools)
+        # The template keeps its compiled code, only replace it when its source changes
+        raw_system_prompt = self.entry.options.get(CONF_SYSTEM_PROMPT, DEFAULT_SYSTEM_PROMPT)
+        if self.system_prompt_template is None or self.system_prompt_template.template != raw_system_prompt:
+            self.system_prompt_template = template.Template(raw_system_prompt, self.hass)
+        old_http_client_settings = self._http_client_settings
+        old_http_client = self._async_update_http_client()
+        try:
+            # Creating the provider clients does blocking work (ssl context, sdk setup)
+            self.agent_chain = await self.hass.async_add_executor_job(self._build_agent_chain, human_prompt)
+        except Exception:
+            if old_http_client is not None:
+                # The previous agent chain stays in use, and so does its client
+                new_http_client = self.http_client
+                self.http_client, self._http_client_settings = old_http_client, old_http_client_settings
+                await new_http_client.aclose()
+            # Without a previous client the new one is closed by async_close
+            raise
+        if old_http_client is not None:
+            await old_http_client.aclose()
+
+    @callback
+    def _async_update_http_client(self) -> httpx.AsyncClient | None:
+        """Keep one pooled keep-alive client per config entry, return the replaced client to close."""
+        if self.entry.data.get(CONF_MODEL_TYPE) != MODEL_OPENAI:
+            # The Tongyi and Qianfan sdks manage their own http sessions
+            return None
+
+        pool_size = self.entry.options.get(CONF_HTTP_POOL_SIZE, DEFAULT_HTTP_POOL_SIZE)
+        timeout = self.entry.options.get(CONF_HTTP_TIMEOUT, DEFAULT_HTTP_TIMEOUT)
+        if self.http_client is not None and self._http_client_settings == (pool_size, timeout):
+            return None
+
+        old_http_client = self.http_client
+        # Built like create_async_httpx_client does, which can't be used: it sets its own limits,
+        # and the client it returns can't be closed
+        self.http_client = httpx.AsyncClient(
+            verify=client_context(),
+            headers={USER_AGENT: SERVER_SOFTWARE},
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=KEEP_ALIVE_TIMEOUT
+            ),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, HTTP_CONNECT_TIMEOUT)),
+        )
+        self._http_client_settings = (pool_size, timeout)
+        return old_http_client
+
+    async def async_setup(self) -> None:
+        await self.ha_service.async_setup()
+        await self.async_update_retrieval()
+
+    async def async_unload(self) -> None:
+        if self.retrieval is not None:
+            await self.retrieval.async_unload()
+            self.retrieval = None
+        await self.ha_service.reloader.async_flush()
+        self.ha_service.async_unload()
+
+    async def async_update_retrieval(self) -> None:
+        """Start or stop the semantic retrieval when its option changes."""
+        enabled = self.entry.options.get(CONF_SEMANTIC_RETRIEVAL, DEFAULT_SEMANTIC_RETRIEVAL)
+        if not enabled:
+            if self.retrieval is not None:
+                await self.retrieval.async_unload()
+                self.retrieval = None
+            return
+        if self.retrieval is not None:
+            return
+
+        try:
+            # numpy is optional and slow to import
+            module = await self.hass.async_add_executor_job(
+                importlib.import_module, ".semantic_retrieval", __package__
+            )
+        except ImportError as err:
+            _LOGGER.warning("Semantic retrieval is not available, numpy can't be imported: %s", err)
+            return
+        retrieval = module.SemanticRetrieval(self.hass, self.ha_service, self.entry.entry_id)
+        await retrieval.async_setup()
+        self.retrieval = retrieval
+
+    async def async_close(self) -> None:
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    def _build_agent_chain(self, human_prompt: str):
+        llm = self._get_llm()
+        if llm is None:
+            raise ConfigEntryNotReady
+
+        # Completion LLMs like Tongyi don't stream tokens through callbacks, answer in one piece
+        self.stream_response = self._stream_enabled() and isinstance(llm, BaseChatModel)
+        if self._stream_enabled() and not self.stream_response:
+            _LOGGER.debug("Streaming not supported by %s, falling back to complete responses", type(llm).__name__)
+
+        return build_agent_executor(
+            llm=llm,
+            tools=self.tools,
+            model_type=self.entry.data.get(CONF_MODEL_TYPE),
+            human_prompt=human_prompt,
+            max_iterations=self.entry.options.get(CONF_LANGCHAIN_MAX_ITERATIONS, DEFAULT_LANGCHAIN_MAX_ITERATIONS)
+        )
+
+    def _stream_enabled(self) -> bool:
+        return self.entry.options.get(CONF_STREAM_RESPONSE, DEFAULT_STREAM_RESPONSE)
+
+    def _create_memory(self) -> BaseChatMemory:
+        if self.entry.options.get(CONF_LANGCHAIN_MEMORY_MODE, DEFAULT_LANGCHAIN_MEMORY_MODE) == MEMORY_MODE_TOKEN_BUDGET:
+            return ConversationTokenBudgetMemory(
+                return_messages=True,
+                memory_key='chat_history',
+                input_key='input',
+                max_token_limit=self.entry.options.get(
+                    CONF_LANGCHAIN_MEMORY_TOKEN_BUDGET, DEFAULT_LANGCHAIN_MEMORY_TOKEN_BUDGET
+                )
+            )
+        return ConversationBufferWindowMemory(
+            return_messages=True,
+            memory_key='chat_history',
+            input_key='input',
+            k=self.entry.options.get(CONF_LANGCHAIN_MEMORY_WINDOW_SIZE, DEFAULT_LANGCHAIN_MEMORY_WINDOW_SIZE)
+        )
+
+    def _update_memories(self) -> None:
+        """Apply the memory options to the live conversations."""
+        memories = self.conversations.memories()
+        if memories and type(memories[0]) is not type(self._create_memory()):
+            # Memory mode changed, the old histories don't fit the new mode
+            self.conversations.clear()
+            return
+
+        window_size = self.entry.options.get(CONF_LANGCHAIN_MEMORY_WINDOW_SIZE, DEFAULT_LANGCHAIN_MEMORY_WINDOW_SIZE)
+        token_budget = self.entry.options.get(CONF_LANGCHAIN_MEMORY_TOKEN_BUDGET, DEFAULT_LANGCHAIN_MEMORY_TOKEN_BUDGET)
+        for memory in memories:
+            if isinstance(memory, ConversationTokenBudgetMemory):
+                memory.max_token_limit = token_budget
+                memory.prune()
+            else:
+                memory.k = window_size
+
+    def _get_llm(self):
+        model_type = self.entry.data.get(CONF_MODEL_TYPE)
+        if model_type == MODEL_TONGYI:
+            return self._get_tongyi_model()
+        if model_type == MODEL_OPENAI:
+            return self._get_openai_model()
+        if model_type == MODEL_QIANFAN:
+            return self._get_qianfan_model()
+
+    def _get_tongyi_model(self):
+        api_key = self.entry.data.get(CONF_API_KEY)
+        model_name = self.entry.data.get(CONF_CHAT_MODEL, DEFAULT_TONGYI_CHAT_MODEL)
+        top_p = self.entry.options.get(CONF_TOP_P, DEFAULT_TONGYI_TOP_P)
+        return self.llm_class(model_name=model_name, dashscope_api_key=api_key, top_p=top_p)
+
+    def _get_openai_model(self):
+        api_key = self.entry.data.get(CONF_API_KEY)
+        model_name = self.entry.data.get(CONF_CHAT_MODEL, DEFAULT_OPENAI_CHAT_MODEL)
+        base_url = self.entry.data.get(CONF_BASE_URL, DEFAULT_OPENAI_BASE_URL)
+        temperature = self.entry.options.get(CONF_TEMPERATURE, DEFAULT_OPENAI_TEMPERATURE)
+        max_tokens = self.entry.options.get(CONF_MAX_TOKENS, DEFAULT_OPENAI_MAX_TOKENS)
+        return self.llm_class(
+            model_name=model_name,
+            openai_api_key=api_key,
+            openai_api_base=base_url,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            streaming=self._stream_enabled(),
+            http_async_client=self.http_client
+        )
+
+    def _get_qianfan_model(self):
+        ak = self.entry.data.get(CONF_API_KEY)
+        sk = self.entry.data.get(CONF_SECRET_KEY)
+        model_name = self.entry.data.get(CONF_CHAT_MODEL, DEFAULT_QIANFAN_CHAT_MODEL)
+        top_p = self.entry.options.get(CONF_TOP_P, DEFAULT_QIANFAN_TOP_P)
+        temperature = self.entry.options.get(CONF_TEMPERATURE, DEFAULT_QIANFAN_TEMPERATURE)
+        return self.llm_class(qianfan_ak=ak, qianfan_sk=sk, model=model_name, top_p=top_p, temperature=temperature,
+                              streaming=self._stream_enabled(),
+                              request_timeout=self.entry.options.get(CONF_HTTP_TIMEOUT, DEFAULT_HTTP_TIMEOUT))
+
+    def _async_generate_system_prompt(
+            self, prompt_template: template.Template, agent_prompt: str, text: str, touched: set[str] | None = None
+    ) -> str:
+        """Generate a prompt for the user, adding the entities whose states it shows to touched."""
+        service = self.ha_service
+        snapshot = []
+        retrieved = []
+
+        def exposed_entities():
+            # Computed at most once per turn, shared by every variable derived from it
+            if not snapshot:
+                snapshot.append(service.get_all_exposed_entities())
+            return snapshot[0]
+
+        def shown(entities):
+            if touched is not None:
+                touched.update(entity["entity_id"] for entity in entities)
+            return entities
+
+        def relevant():
+            if not retrieved:
+                if self.retrieval is None:
+                    retrieved.append(([], []))
+                else:
+                    retrieved.append(self.retrieval.search(text, self.entry.options.get(
+                        CONF_SEMANTIC_RETRIEVAL_TOP_K, DEFAULT_SEMANTIC_RETRIEVAL_TOP_K
+                    )))
+            return retrieved[0]
+
+        return prompt_template.async_render(
+            build_render_context(prompt_template.template, {
+                "ha_name": lambda: self.hass.config.location_name,
+                "exposed_areas": lambda: service.get_all_exposed_areas(exposed_entities()),
+                "exposed_entities": lambda: shown(exposed_entities()),
+                "relevant_entities": lambda: shown(relevant()[0]),
+                "relevant_scripts": lambda: relevant()[1],
+                "agent_system_prompt": lambda: agent_prompt
+            }),
+            parse_result=False,
+        )
+
+    def _async_generate_human_prompt(self, raw_prompt: str, agent_prompt: str) -> str:
+        """Generate a prompt for the user."""
+        return template.Template(raw_prompt, self.hass).async_render(
+            {
+                "agent_human_prompt": agent_prompt
+            },
+            parse_result=False,
+        )
+
+    def _create_stream_handler(self, conversation_id: str) -> FinalAnswerStreamHandler | None:
+        if not self.stream_response:
+            return None
+        return FinalAnswerStreamHandler(
+            structured=self.entry.data.get(CONF_MODEL_TYPE) != MODEL_OPENAI,
+            on_sentence=lambda text: self._fire_response_stream(conversation_id, text, False)
+        )
+
+    def _fire_response_stream(self, conversation_id: str, delta: str, done: bool) -> None:
+        """Final answer pieces for consumers like TTS, which can start before the agent run ends."""
+        self.hass.bus.async_fire(
+            EVENT_RESPONSE_STREAM,
+            {"agent_id": self.entry.entry_id, "conversation_id": conversation_id, "delta": delta, "done": done}
+        )
+
+    @callback
+    def _record_turn(self, start: float) -> None:
+        self.metrics.record("turn", time.perf_counter() - start)
+        self.metrics.increment("turns")
+        self.metrics.notify()
+
+    @property
+    def supported_languages(self) -> list[str] | Literal["*"]:
+        """Return a list of supported languages."""
+        return MATCH_ALL
+
+    async def async_process(
+            self, user_input: conversation.ConversationInput
+    ) -> conversation.ConversationResult:
+        start = time.perf_counter()
+        conversation_id, memory = self.conversations.get(user_input.conversation_id)
+        trace = self.traces.start_turn(
+            self.entry.options.get(CONF_TRACING_MODE, DEFAULT_TRACING_MODE), conversation_id, user_input.text
+        )
+        if self.entry.options.get(CONF_FAST_PATH, DEFAULT_FAST_PATH):
+            speech = await self.fast_path.async_handle(user_input.text)
+            if speech is not None:
+                memory.save_context({"input": user_input.text}, {"output": speech})
+                if trace is not None:
+                    trace.add("fast_path", **({"answer": speech} if trace.full else {}))
+                self.metrics.increment("fast_path_turns")
+                self._record_turn(start)
+                intent_response = intent.IntentResponse(language=user_input.language)
+                intent_response.async_set_speech(speech)
+                return conversation.ConversationResult(
+                    response=intent_response, conversation_id=conversation_id
+                )
+
+        user_message = {"role": "user", "input": user_input.text}
+        user_message.update(memory.load_memory_variables(user_message))
+        # Without history the answer depends on nothing but the utterance and the touched entities,
+        # answers are only stored and served for the first turn of a conversation
+        use_answer_cache = (
+            self.entry.options.get(CONF_ANSWER_CACHE, DEFAULT_ANSWER_CACHE) and not user_message["chat_history"]
+        )
+        if use_answer_cache:
+            answer = self.answer_cache.get(user_input.language, user_input.text)
+            if answer is not None:
+                memory.save_context({"input": user_input.text}, {"output": answer})
+                if trace is not None:
+                    trace.add("answer_cache", **({"answer": answer} if trace.full else {}))
+                self.metrics.increment("answer_cache_turns")
+                self._record_turn(start)
+                intent_response = intent.IntentResponse(language=user_input.language)
+                intent_response.async_set_speech(answer)
+                return conversation.ConversationResult(
+                    response=intent_response, conversation_id=conversation_id
+                )
+
+        tracer = TurnTracer(self.metrics, trace)
+        callbacks = [tracer]
+        recorder = None
+        touched: set[str] = set()
+        if use_answer_cache:
+            recorder = TouchedEntitiesRecorder(lambda entity_id: self.ha_service.entity_index.get(entity_id) is not None)
+            callbacks.append(recorder)
+        since = dt_util.utcnow()
+        try:
+            prompt_start = time.perf_counter()
+            system_prompt = self._async_generate_system_prompt(
+                self.system_prompt_template, self.agent_system_prompt, user_input.text, touched
+            )
+            self.metrics.record("system_prompt", time.perf_counter() - prompt_start)
+            user_message[SYSTEM_PROMPT_KEY] = system_prompt
+            if trace is not None:
+                # Sizes are only computed, and the prompt only kept, for traced turns
+                if trace.full:
+                    trace.add("system_prompt", text=system_prompt)
+                else:
+                    trace.add("system_prompt", chars=len(system_prompt))
+                trace.add("chat_history", messages=len(user_message["chat_history"]),
+                          tokens=count_message_tokens(user_message["chat_history"]))
+            stream_handler = self._create_stream_handler(conversation_id)
+            if stream_handler:
+                callbacks.append(stream_handler)
+            response = await self.agent_chain.ainvoke(user_message, config={"callbacks": callbacks})
+            if stream_handler:
+                stream_handler.flush()
+                if not stream_handler.streamed:
+                    # e.g. the agent stopped early, its output was never generated token by token
+                    self._fire_response_stream(conversation_id, response["output"], False)
+                self._fire_response_stream(conversation_id, "", True)
+            memory.save_context({"input": user_input.text}, {"output": response["output"]})
+            # A run stopped by the iteration limit has no real answer
+            max_iterations = self.entry.options.get(CONF_LANGCHAIN_MAX_ITERATIONS, DEFAULT_LANGCHAIN_MAX_ITERATIONS)
+            if recorder is not None and recorder.read_only and not recorder.failed and tracer.llm_calls < max_iterations:
+                self.answer_cache.put(
+                    user_input.language, user_input.text, response["output"], touched | recorder.entity_ids, since,
+                    tracer.prompt_tokens + tracer.completion_tokens
+                )
+            if trace is not None:
+                trace.add("answer", **({"text": response["output"]} if trace.full else {}))
+        except HomeAssistantError as err:
+            _LOGGER.error(err, exc_info=err)
+            self.metrics.increment("failed_turns")
+            if trace is not None:
+                trace.add("error", error=repr(err))
+            intent_response = intent.IntentResponse(language=user_input.language)
+            intent_response.async_set_error(
+                intent.IntentResponseErrorCode.UNKNOWN,
+                f"Something went wrong: {err}",
+            )
+            return conversation.ConversationResult(
+                response=intent_response, conversation_id=conversation_id
+            )
+        except Exception as err:
+            _LOGGER.error(err, exc_info=err)
+            self.metrics.increment("failed_turns")
+            if trace is not None:
+                trace.add("error", error=repr(err))
+            intent_response = intent.IntentResponse(language=user_input.language)
+            intent_response.async_set_error(
+                intent.IntentResponseErrorCode.UNKNOWN,
+                f"Something went wrong: {err}",
+            )
+            return conversation.ConversationResult(
+                response=intent_response, conversation_id=conversation_id
+            )
+        finally:
+            if self.ha_service.reloader.pending:
+                # One reload per domain for everything the run changed, without delaying the answer
+                self.hass.async_create_task(self.ha_service.reloader.async_flush())
+            tracer.finish()
+            self._record_turn(start)
+
+        intent_response = intent.IntentResponse(language=user_input.language)
+        intent_response.async_set_speech(response["output"])
+        return conversation.ConversationResult(
+            response=intent_response, conversation_id=conversation_id
+        )
+
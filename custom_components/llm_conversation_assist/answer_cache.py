@@ -0,0 +1,107 @@
+"""Answers of informational questions, reused while the entities they were built from are unchanged."""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .intent_matcher import normalize
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class _CachedAnswer:
+    answer: str
+    # (entity_id, last_updated) of every entity the answer was built from
+    fingerprint: tuple[tuple[str, datetime], ...]
+    created: float
+    # Tokens the agent run used, saved by every hit
+    tokens: int
+
+
+class AnswerCache:
+    """Final answers by language and normalized utterance.
+
+    An entry is only served while every entity it touched still has the state (and attributes)
+    it had when the answer was built, checked on lookup against last_updated, and for at most
+    max_age seconds, for what is not tracked like the time of day.
+    """
+
+    def __init__(self, hass: HomeAssistant, max_entries: int, max_age: float):
+        self.hass = hass
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.saved_tokens = 0
+        self._entries: OrderedDict[tuple[str, str], _CachedAnswer] = OrderedDict()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 3),
+            "invalidated": self.invalidated,
+            "saved_tokens": self.saved_tokens,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get(self, language: str, text: str) -> str | None:
+        key = (language, normalize(text))
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - entry.created > self.max_age or not self._unchanged(entry.fingerprint):
+            del self._entries[key]
+            self.invalidated += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved_tokens += entry.tokens
+        _LOGGER.debug("Answer cache hit, hit ratio %.2f", self.hit_ratio)
+        return entry.answer
+
+    def put(self, language: str, text: str, answer: str, entity_ids: set[str], since: datetime, tokens: int) -> None:
+        """Keep an answer built from the given entities by a turn started at since."""
+        if not entity_ids:
+            # Nothing to invalidate it by, e.g. small talk
+            return
+        fingerprint = []
+        for entity_id in sorted(entity_ids):
+            state = self.hass.states.get(entity_id)
+            if state is None or state.last_updated > since:
+                # Changed while the agent was running, the answer may show either state
+                return
+            fingerprint.append((entity_id, state.last_updated))
+
+        key = (language, normalize(text))
+        self._entries[key] = _CachedAnswer(answer, tuple(fingerprint), time.monotonic(), tokens)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _unchanged(self, fingerprint: tuple[tuple[str, datetime], ...]) -> bool:
+        for entity_id, last_updated in fingerprint:
+            state = self.hass.states.get(entity_id)
+            if state is None or state.last_updated != last_updated:
+                return False
+        return True
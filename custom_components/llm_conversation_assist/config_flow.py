@@ -78,7 +78,16 @@ DEFAULT_COMMON_OPTIONS = types.MappingProxyType(
         CONF_SYSTEM_PROMPT: DEFAULT_SYSTEM_PROMPT,
         CONF_HUMAN_PROMPT: DEFAULT_HUMAN_PROMPT,
         CONF_LANGCHAIN_MAX_ITERATIONS: DEFAULT_LANGCHAIN_MAX_ITERATIONS,
-        CONF_LANGCHAIN_MEMORY_WINDOW_SIZE: DEFAULT_LANGCHAIN_MEMORY_WINDOW_SIZE
+        CONF_LANGCHAIN_MEMORY_WINDOW_SIZE: DEFAULT_LANGCHAIN_MEMORY_WINDOW_SIZE,
+        CONF_LANGCHAIN_MEMORY_MODE: DEFAULT_LANGCHAIN_MEMORY_MODE,
+        CONF_LANGCHAIN_MEMORY_TOKEN_BUDGET: DEFAULT_LANGCHAIN_MEMORY_TOKEN_BUDGET,
+        CONF_STREAM_RESPONSE: DEFAULT_STREAM_RESPONSE,
+        CONF_HTTP_TIMEOUT: DEFAULT_HTTP_TIMEOUT,
+        CONF_FAST_PATH: DEFAULT_FAST_PATH,
+        CONF_SEMANTIC_RETRIEVAL: DEFAULT_SEMANTIC_RETRIEVAL,
+        CONF_SEMANTIC_RETRIEVAL_TOP_K: DEFAULT_SEMANTIC_RETRIEVAL_TOP_K,
+        CONF_TRACING_MODE: DEFAULT_TRACING_MODE,
+        CONF_ANSWER_CACHE: DEFAULT_ANSWER_CACHE
     }
 )
 
@@ -91,7 +100,8 @@ DEFAULT_TONGYI_OPTIONS = types.MappingProxyType(
 DEFAULT_OPENAI_OPTIONS = types.MappingProxyType(
     {
         CONF_TEMPERATURE: DEFAULT_OPENAI_TEMPERATURE,
-        CONF_MAX_TOKENS: DEFAULT_OPENAI_MAX_TOKENS
+        CONF_MAX_TOKENS: DEFAULT_OPENAI_MAX_TOKENS,
+        CONF_HTTP_POOL_SIZE: DEFAULT_HTTP_POOL_SIZE
     }
 )
 
@@ -284,6 +294,67 @@ class OptionsFlow(config_entries.OptionsFlow):
                 description={"suggested_value": options[CONF_LANGCHAIN_MEMORY_WINDOW_SIZE]},
                 default=DEFAULT_LANGCHAIN_MEMORY_WINDOW_SIZE,
             ): int,
+            vol.Optional(
+                CONF_LANGCHAIN_MEMORY_MODE,
+                description={"suggested_value": options.get(CONF_LANGCHAIN_MEMORY_MODE, DEFAULT_LANGCHAIN_MEMORY_MODE)},
+                default=DEFAULT_LANGCHAIN_MEMORY_MODE,
+            ): SelectSelector(
+                SelectSelectorConfig(
+                    options=[MEMORY_MODE_WINDOW, MEMORY_MODE_TOKEN_BUDGET],
+                    mode=SelectSelectorMode.DROPDOWN,
+                    multiple=False,
+                    translation_key="memory_mode",
+                )
+            ),
+            vol.Optional(
+                CONF_LANGCHAIN_MEMORY_TOKEN_BUDGET,
+                description={"suggested_value": options.get(CONF_LANGCHAIN_MEMORY_TOKEN_BUDGET, DEFAULT_LANGCHAIN_MEMORY_TOKEN_BUDGET)},
+                default=DEFAULT_LANGCHAIN_MEMORY_TOKEN_BUDGET,
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                CONF_STREAM_RESPONSE,
+                description={"suggested_value": options.get(CONF_STREAM_RESPONSE, DEFAULT_STREAM_RESPONSE)},
+                default=DEFAULT_STREAM_RESPONSE,
+            ): bool,
+            vol.Optional(
+                CONF_HTTP_TIMEOUT,
+                description={"suggested_value": options.get(CONF_HTTP_TIMEOUT, DEFAULT_HTTP_TIMEOUT)},
+                default=DEFAULT_HTTP_TIMEOUT,
+            ): NumberSelector(NumberSelectorConfig(min=5, max=600, step=5, unit_of_measurement="s")),
+            vol.Optional(
+                CONF_FAST_PATH,
+                description={"suggested_value": options.get(CONF_FAST_PATH, DEFAULT_FAST_PATH)},
+                default=DEFAULT_FAST_PATH,
+            ): bool,
+            vol.Optional(
+                CONF_SEMANTIC_RETRIEVAL,
+                description={"suggested_value": options.get(CONF_SEMANTIC_RETRIEVAL, DEFAULT_SEMANTIC_RETRIEVAL)},
+                default=DEFAULT_SEMANTIC_RETRIEVAL,
+            ): bool,
+            vol.Optional(
+                CONF_SEMANTIC_RETRIEVAL_TOP_K,
+                description={
+                    "suggested_value": options.get(CONF_SEMANTIC_RETRIEVAL_TOP_K, DEFAULT_SEMANTIC_RETRIEVAL_TOP_K)
+                },
+                default=DEFAULT_SEMANTIC_RETRIEVAL_TOP_K,
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                CONF_ANSWER_CACHE,
+                description={"suggested_value": options.get(CONF_ANSWER_CACHE, DEFAULT_ANSWER_CACHE)},
+                default=DEFAULT_ANSWER_CACHE,
+            ): bool,
+            vol.Optional(
+                CONF_TRACING_MODE,
+                description={"suggested_value": options.get(CONF_TRACING_MODE, DEFAULT_TRACING_MODE)},
+                default=DEFAULT_TRACING_MODE,
+            ): SelectSelector(
+                SelectSelectorConfig(
+                    options=[TRACING_MODE_OFF, TRACING_MODE_SAMPLED, TRACING_MODE_FULL],
+                    mode=SelectSelectorMode.DROPDOWN,
+                    multiple=False,
+                    translation_key="tracing_mode",
+                )
+            ),
         }
 
     def llm_config_option_schema(self, options: MappingProxyType[str, Any]) -> dict:
@@ -322,6 +393,11 @@ class OptionsFlow(config_entries.OptionsFlow):
                 description={"suggested_value": options[CONF_MAX_TOKENS]},
                 default=DEFAULT_OPENAI_MAX_TOKENS,
             ): int,
+            vol.Optional(
+                CONF_HTTP_POOL_SIZE,
+                description={"suggested_value": options.get(CONF_HTTP_POOL_SIZE, DEFAULT_HTTP_POOL_SIZE)},
+                default=DEFAULT_HTTP_POOL_SIZE,
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
         }
 
     def qianfan_config_option_schema(self, options: MappingProxyType[str, Any]) -> dict:
@@ -37,6 +37,66 @@ DEFAULT_LANGCHAIN_MAX_ITERATIONS = 5
 CONF_LANGCHAIN_MEMORY_WINDOW_SIZE = "langchain_memory_window_size"
 DEFAULT_LANGCHAIN_MEMORY_WINDOW_SIZE = 5
 
+CONF_LANGCHAIN_MEMORY_MODE = "langchain_memory_mode"
+MEMORY_MODE_WINDOW = "window"
+MEMORY_MODE_TOKEN_BUDGET = "token_budget"
+DEFAULT_LANGCHAIN_MEMORY_MODE = MEMORY_MODE_WINDOW
+
+CONF_LANGCHAIN_MEMORY_TOKEN_BUDGET = "langchain_memory_token_budget"
+DEFAULT_LANGCHAIN_MEMORY_TOKEN_BUDGET = 1000
+
+# Simple device commands are executed locally, without asking the LLM (and without confirmation)
+CONF_FAST_PATH = "fast_path"
+DEFAULT_FAST_PATH = False
+
+CONF_HTTP_POOL_SIZE = "http_pool_size"
+DEFAULT_HTTP_POOL_SIZE = 10
+CONF_HTTP_TIMEOUT = "http_timeout"
+DEFAULT_HTTP_TIMEOUT = 60
+HTTP_CONNECT_TIMEOUT = 10
+
+CONF_STREAM_RESPONSE = "stream_response"
+DEFAULT_STREAM_RESPONSE = False
+# Fired with pieces of the final answer while it is generated, when streaming is enabled
+EVENT_RESPONSE_STREAM = f"{DOMAIN}_response_stream"
+
+# Only the entities and scripts most related to the utterance are put into the system prompt,
+# needs numpy
+CONF_SEMANTIC_RETRIEVAL = "semantic_retrieval"
+DEFAULT_SEMANTIC_RETRIEVAL = False
+CONF_SEMANTIC_RETRIEVAL_TOP_K = "semantic_retrieval_top_k"
+DEFAULT_SEMANTIC_RETRIEVAL_TOP_K = 10
+RETRIEVAL_STORAGE_VERSION = 1
+RETRIEVAL_STORAGE_KEY = DOMAIN + ".embeddings.{entry_id}"
+
+# Answers of read-only turns are reused for the same normalized utterance while the entities
+# they were built from keep their states
+CONF_ANSWER_CACHE = "answer_cache"
+DEFAULT_ANSWER_CACHE = False
+ANSWER_CACHE_SIZE = 100
+# Seconds, for what the answer may depend on but is not tracked, like the time of day
+ANSWER_CACHE_MAX_AGE = 3600
+
+# Turns recorded into the trace buffer of the diagnostics; sampled traces keep one turn in
+# TRACE_SAMPLE_INTERVAL without contents, full traces every turn with prompts and outputs
+CONF_TRACING_MODE = "tracing_mode"
+TRACING_MODE_OFF = "off"
+TRACING_MODE_SAMPLED = "sampled"
+TRACING_MODE_FULL = "full"
+DEFAULT_TRACING_MODE = TRACING_MODE_OFF
+TRACE_BUFFER_SIZE = 20
+TRACE_SAMPLE_INTERVAL = 10
+
+# Rows returned by the get_all_exposed_entities tool when no limit is given
+EXPOSED_ENTITIES_ROW_LIMIT = 100
+
+# Candidates returned by the search_exposed_entities tool when no limit is given
+SEARCH_ENTITIES_LIMIT = 5
+
+# Chat memories are kept per conversation_id, bounded for many short-lived voice sessions
+CONVERSATION_MAX_COUNT = 50
+CONVERSATION_IDLE_TIMEOUT = 600
+
 CONF_SYSTEM_PROMPT = "system_prompt"
 DEFAULT_SYSTEM_PROMPT = """This smart home is controlled by Home Assistant. 
 You are a helpful personal butler, if the user wants to control a device, try to use Home Assistant tools.
@@ -48,6 +108,26 @@ area_id, area_name, area_aliases
 {{ area['area_id'] }},{{ area['name'] }},{{ area['aliases'] | join('/')}}
 {% endfor %}
 ```
+{% if relevant_entities %}
+
+Devices that may be related to the request:
+```csv
+entity_id,name,area_name,state
+{% for entity in relevant_entities %}
+{{ entity['entity_id'] }},{{ entity['name'] }},{{ entity['area_name'] }},{{ entity['state'] }}
+{% endfor %}
+```
+{% endif %}
+{% if relevant_scripts %}
+
+Scripts that may be related to the request:
+```csv
+script_id,alias,description
+{% for script in relevant_scripts %}
+script.{{ script['script_id'] }},{{ script['alias'] }},{{ script['description'] }}
+{% endfor %}
+```
+{% endif %}
 
 {{agent_system_prompt}}
 Do not execute service without user's confirmation.
@@ -0,0 +1,64 @@
+"""Chat memories of the live conversations."""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
+from homeassistant.util import ulid as ulid_util
+
+_LOGGER = logging.getLogger(__name__)
+
+_MemoryT = TypeVar("_MemoryT")
+
+
+class ConversationStore(Generic[_MemoryT]):
+    """Memory per conversation_id, bounded in count and evicted when idle.
+
+    Conversations are kept in least recently used order, so both the LRU and the idle
+    eviction only look at the front of the dict.
+    """
+
+    def __init__(self, memory_factory: Callable[[], _MemoryT], max_conversations: int, idle_timeout: float):
+        self.memory_factory = memory_factory
+        self.max_conversations = max_conversations
+        self.idle_timeout = idle_timeout
+        # conversation_id -> (last used, memory)
+        self._conversations: OrderedDict[str, tuple[float, _MemoryT]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def memories(self) -> list[_MemoryT]:
+        return [memory for _, memory in self._conversations.values()]
+
+    def get(self, conversation_id: str | None) -> tuple[str, _MemoryT]:
+        """Get the memory of a conversation, a new conversation is started for unknown ids."""
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        if conversation_id is None:
+            conversation_id = ulid_util.ulid_now()
+
+        if (item := self._conversations.pop(conversation_id, None)) is not None:
+            memory = item[1]
+        else:
+            memory = self.memory_factory()
+            while len(self._conversations) >= self.max_conversations:
+                evicted_id, _ = self._conversations.popitem(last=False)
+                _LOGGER.debug("Evicted least recently used conversation %s", evicted_id)
+
+        self._conversations[conversation_id] = (now, memory)
+        return conversation_id, memory
+
+    def clear(self) -> None:
+        self._conversations.clear()
+
+    def _evict_idle(self, now: float) -> None:
+        while self._conversations:
+            conversation_id, (last_used, _) = next(iter(self._conversations.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._conversations[conversation_id]
+            _LOGGER.debug("Evicted idle conversation %s", conversation_id)
@@ -0,0 +1,27 @@
+"""Diagnostics support for LLM Conversation Assist."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    agent = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "options": dict(entry.options),
+        "fast_path": {
+            "hits": agent.fast_path.hits,
+            "misses": agent.fast_path.misses,
+        },
+        "reloads": agent.ha_service.reloader.stats,
+        "tool_cache": agent.toolkit.cache.stats,
+        "answer_cache": agent.answer_cache.stats,
+        "metrics": agent.metrics.as_dict(),
+        # Formatted here, the turns only keep references to what they traced
+        "traces": agent.traces.as_dict(),
+    }
@@ -0,0 +1,192 @@
+"""In-memory index of the entities exposed to conversation agents."""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Callable
+
+from homeassistant.components.conversation import DOMAIN as CONVERSATION_DOMAIN
+from homeassistant.components.homeassistant.exposed_entities import async_listen_entity_updates
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity_registry as er,
+)
+
+if TYPE_CHECKING:
+    from .ha_service import HaService
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ExposedEntityIndex:
+    """Exposed entities kept up to date from state, registry and exposure events.
+
+    It is filled once at setup, after that every change only touches the entities it concerns,
+    so reading all exposed entities costs O(exposed) instead of a scan of all states.
+    """
+
+    def __init__(self, hass: HomeAssistant, ha_service: HaService):
+        self.hass = hass
+        self.ha_service = ha_service
+        self.ready = False
+        # generation is bumped when exposed entities, names, aliases or areas change,
+        # state_generation when the state of an exposed entity changes
+        self.generation = 0
+        self.state_generation = 0
+        # entity_id -> item as returned by HaService.get_all_exposed_entities
+        self._entities: dict[str, dict[str, Any]] = {}
+        # entity_id -> should_expose result, for every entity with a state
+        self._exposure: dict[str, bool] = {}
+        # device_id -> exposed entity_ids, entity_id -> device_id
+        self._device_entities: dict[str, set[str]] = {}
+        self._entity_device: dict[str, str] = {}
+        self._unsub: list[Callable[[], None]] = []
+        # Told which entity_id changed (name, aliases, area, exposure), None after a full rebuild
+        self._listeners: list[Callable[[str | None], None]] = []
+        self._rebuilding = False
+
+    @callback
+    def async_setup(self) -> None:
+        if self.ready:
+            return
+        self._unsub = [
+            self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed),
+            self.hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated),
+            self.hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated),
+            self.hass.bus.async_listen(ar.EVENT_AREA_REGISTRY_UPDATED, self._async_area_registry_updated),
+            async_listen_entity_updates(self.hass, CONVERSATION_DOMAIN, self.async_rebuild),
+        ]
+        self.async_rebuild()
+        self.ready = True
+
+    @callback
+    def async_unload(self) -> None:
+        for unsub in self._unsub:
+            unsub()
+        self._unsub = []
+        self.ready = False
+        self._clear()
+
+    @callback
+    def get_all(self) -> list[dict[str, Any]]:
+        return list(self._entities.values())
+
+    @callback
+    def get(self, entity_id: str) -> dict[str, Any] | None:
+        return self._entities.get(entity_id)
+
+    @callback
+    def async_add_listener(self, listener: Callable[[str | None], None]) -> Callable[[], None]:
+        """Listen for changes of the exposed entities, state changes excluded."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    @callback
+    def _async_notify(self, entity_id: str | None) -> None:
+        if self._rebuilding:
+            return
+        for listener in self._listeners:
+            listener(entity_id)
+
+    @callback
+    def async_rebuild(self) -> None:
+        """Full scan of all states, only needed at setup and when the exposure settings change."""
+        _LOGGER.debug("Rebuilding exposed entity index")
+        self._clear()
+        self._rebuilding = True
+        try:
+            for state in self.hass.states.async_all():
+                self._async_refresh_entity(state.entity_id)
+        finally:
+            self._rebuilding = False
+        self._async_notify(None)
+        _LOGGER.debug("Exposed entity index: %s exposed of %s entities", len(self._entities), len(self._exposure))
+
+    def _clear(self) -> None:
+        self.generation += 1
+        self._entities = {}
+        self._exposure = {}
+        self._device_entities = {}
+        self._entity_device = {}
+
+    @callback
+    def _async_refresh_entity(self, entity_id: str) -> None:
+        """Re-evaluate exposure and registry data of one entity."""
+        self.generation += 1
+        self._async_remove_entity(entity_id)
+        state = self.hass.states.get(entity_id)
+        if state is not None:
+            exposed = self.ha_service.should_expose(entity_id)
+            self._exposure[entity_id] = exposed
+            if exposed:
+                self._entities[entity_id] = self.ha_service.build_exposed_entity(state)
+                entity_entry = er.async_get(self.hass).async_get(entity_id)
+                if entity_entry and entity_entry.device_id:
+                    self._entity_device[entity_id] = entity_entry.device_id
+                    self._device_entities.setdefault(entity_entry.device_id, set()).add(entity_id)
+        self._async_notify(entity_id)
+
+    @callback
+    def _async_remove_entity(self, entity_id: str) -> None:
+        self._entities.pop(entity_id, None)
+        self._exposure.pop(entity_id, None)
+        if (device_id := self._entity_device.pop(entity_id, None)) is not None:
+            device_entities = self._device_entities[device_id]
+            device_entities.discard(entity_id)
+            if not device_entities:
+                del self._device_entities[device_id]
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        entity_id = event.data["entity_id"]
+        new_state = event.data["new_state"]
+        if new_state is None:
+            if entity_id in self._exposure:
+                self.generation += 1
+                self._async_remove_entity(entity_id)
+                self._async_notify(entity_id)
+            return
+
+        if (entity := self._entities.get(entity_id)) is not None:
+            self.state_generation += 1
+            # Items are shared with readers, replace instead of modifying in place
+            self._entities[entity_id] = {**entity, "state": new_state.state, "name": new_state.name}
+            if entity["name"] != new_state.name:
+                self.generation += 1
+                self._async_notify(entity_id)
+        elif entity_id not in self._exposure:
+            self._async_refresh_entity(entity_id)
+
+    @callback
+    def _async_entity_registry_updated(self, event: Event) -> None:
+        if (old_entity_id := event.data.get("old_entity_id")) is not None:
+            self.generation += 1
+            self._async_remove_entity(old_entity_id)
+            self._async_notify(old_entity_id)
+        self._async_refresh_entity(event.data["entity_id"])
+
+    @callback
+    def _async_device_registry_updated(self, event: Event) -> None:
+        device_id = event.data["device_id"]
+        if event.data["action"] == "create":
+            return
+        entity_ids = set(self._device_entities.get(device_id, ()))
+        # Entities of the device that are not exposed yet may become exposed through it
+        entity_ids.update(
+            entry.entity_id
+            for entry in er.async_entries_for_device(er.async_get(self.hass), device_id)
+        )
+        for entity_id in entity_ids:
+            self._async_refresh_entity(entity_id)
+
+    @callback
+    def _async_area_registry_updated(self, event: Event) -> None:
+        if event.data["action"] == "create":
+            return
+        area_id = event.data["area_id"]
+        for entity_id in [
+            entity_id for entity_id, entity in self._entities.items() if entity["area_id"] == area_id
+        ]:
+            self._async_refresh_entity(entity_id)
@@ -0,0 +1,160 @@
+"""Fuzzy lookup of exposed entities by name, alias, area name and area alias."""
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+from array import array
+from collections import Counter
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any, Callable
+
+from homeassistant.core import callback
+
+from .intent_matcher import normalize
+
+if TYPE_CHECKING:
+    from .entity_index import ExposedEntityIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+_CJK_RUN_RE = re.compile(r"[㐀-䶿一-鿿가-힯぀-ヿ]{2,}")
+# Area words count half of the entity's own names, "kitchen" alone should not outrank "kitchen light"
+_AREA_WEIGHT = 0.5
+# Documents ranked by shared grams before the exact score, per requested result
+_CANDIDATE_FACTOR = 8
+# Compact the postings once this share of the documents is stale
+_COMPACT_RATIO = 0.5
+
+
+def text_grams(text: str) -> set[str]:
+    """Character trigrams of the padded text, plus bigrams of CJK runs where words are short."""
+    text = normalize(text)
+    if not text:
+        return set()
+    padded = f" {text} "
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    for run in _CJK_RUN_RE.findall(text):
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+class EntityResolver:
+    """Inverted n-gram index over the exposed entities.
+
+    Postings are compact arrays of document ids. A changed entity gets a new document and its
+    old one is marked stale, the postings are compacted once too many documents are stale.
+    """
+
+    def __init__(self, entity_index: ExposedEntityIndex, get_all_exposed_entities: Callable[[], list[dict[str, Any]]]):
+        self.entity_index = entity_index
+        self.get_all_exposed_entities = get_all_exposed_entities
+        self._unsub: Callable[[], None] | None = None
+        self._built = False
+        self._clear()
+
+    def _clear(self) -> None:
+        # gram -> document ids, for names/aliases and for area names/aliases
+        self._name_postings: dict[str, array] = {}
+        self._area_postings: dict[str, array] = {}
+        # document id -> entity_id, weighted gram count, alive flag
+        self._doc_entity: list[str] = []
+        self._doc_norm = array("f")
+        self._doc_alive = bytearray()
+        # entity_id -> current document id
+        self._entity_doc: dict[str, int] = {}
+        self._stale = 0
+
+    @callback
+    def async_setup(self) -> None:
+        self._unsub = self.entity_index.async_add_listener(self._async_entity_changed)
+        self.rebuild()
+
+    @callback
+    def async_unload(self) -> None:
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        self._built = False
+        self._clear()
+
+    def rebuild(self) -> None:
+        self._clear()
+        for entity in self.get_all_exposed_entities():
+            self._add(entity)
+        self._built = True
+        _LOGGER.debug("Entity resolver: %s documents, %s grams",
+                      len(self._doc_entity), len(self._name_postings) + len(self._area_postings))
+
+    @callback
+    def _async_entity_changed(self, entity_id: str | None) -> None:
+        if entity_id is None:
+            self.rebuild()
+            return
+        self._remove(entity_id)
+        if (entity := self.entity_index.get(entity_id)) is not None:
+            self._add(entity)
+        if self._stale > len(self._doc_entity) * _COMPACT_RATIO:
+            self.rebuild()
+
+    def _add(self, entity: dict[str, Any]) -> None:
+        doc_id = len(self._doc_entity)
+        name_grams = set()
+        for name in [entity["name"], *entity["aliases"]]:
+            if name:
+                name_grams |= text_grams(name)
+        area_grams = set()
+        if entity["area_id"]:
+            for name in [entity["area_name"], *entity["area_aliases"]]:
+                if name:
+                    area_grams |= text_grams(name)
+        area_grams -= name_grams
+
+        for gram in name_grams:
+            self._name_postings.setdefault(gram, array("I")).append(doc_id)
+        for gram in area_grams:
+            self._area_postings.setdefault(gram, array("I")).append(doc_id)
+        self._doc_entity.append(entity["entity_id"])
+        self._doc_norm.append(len(name_grams) + _AREA_WEIGHT * len(area_grams))
+        self._doc_alive.append(1)
+        self._entity_doc[entity["entity_id"]] = doc_id
+
+    def _remove(self, entity_id: str) -> None:
+        if (doc_id := self._entity_doc.pop(entity_id, None)) is not None:
+            self._doc_alive[doc_id] = 0
+            self._stale += 1
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[str, float]]:
+        """Best matching entity_ids with a score between 0 and 1."""
+        if not self._built or not self.entity_index.ready:
+            # Not following the entity index, build from a fresh snapshot
+            self.rebuild()
+
+        query_grams = text_grams(query)
+        if not query_grams:
+            return []
+
+        # Name grams count twice, area grams once, see _AREA_WEIGHT
+        hits = Counter()
+        for gram in query_grams:
+            if (postings := self._name_postings.get(gram)) is not None:
+                hits.update(postings)
+                hits.update(postings)
+            if (postings := self._area_postings.get(gram)) is not None:
+                hits.update(postings)
+
+        # Only the documents sharing the most grams can score best, rank those by the exact score
+        alive = self._doc_alive
+        norms = self._doc_norm
+        query_norm = len(query_grams)
+        scores = []
+        for doc_id, shared in heapq.nlargest(limit * _CANDIDATE_FACTOR, hits.items(), key=itemgetter(1)):
+            if alive[doc_id]:
+                scores.append((shared / 2 / math.sqrt(query_norm * norms[doc_id]), doc_id))
+        scores.sort(reverse=True)
+
+        return [
+            (self._doc_entity[doc_id], round(score, 3))
+            for score, doc_id in scores[:limit]
+        ]
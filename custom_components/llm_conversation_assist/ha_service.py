@@ -1,21 +1,20 @@
 import asyncio
 import csv
 import io
-import os
 import uuid
 import voluptuous as vol
-from typing import Any
+from typing import Any, Callable
 
 from homeassistant.core import callback
+from homeassistant.core import Event
 from homeassistant.core import Service
 from homeassistant.core import HomeAssistant
+from homeassistant.core import State
 from homeassistant.components.conversation import DOMAIN as CONVERSATION_DOMAIN
 from homeassistant.components.homeassistant.exposed_entities import async_should_expose
 from homeassistant.components.script import DOMAIN as SCRIPT_DOMAIN
 from homeassistant.components.script.config import async_validate_config_item as async_validate_script_config_item
 from homeassistant.exceptions import HomeAssistantError
-from homeassistant.util.file import write_utf8_file_atomic
-from homeassistant.util.yaml import dump, load_yaml
 
 from homeassistant.components.automation.config import (
     async_validate_config_item as async_validate_automation_config_item,
@@ -24,8 +23,9 @@ from homeassistant.components.automation.config import (
 
 from homeassistant.const import (
     CLOUD_NEVER_EXPOSED_ENTITIES,
-    CONF_ID,
-    SERVICE_RELOAD
+    EVENT_SERVICE_REGISTERED,
+    EVENT_SERVICE_REMOVED,
+    CONF_ID
 )
 from homeassistant.config import (
     AUTOMATION_CONFIG_PATH,
@@ -44,31 +44,47 @@ from homeassistant.helpers import (
     entity_registry as er,
 )
 
+from .const import (
+    EXPOSED_ENTITIES_ROW_LIMIT,
+    SEARCH_ENTITIES_LIMIT
+)
+from .entity_index import ExposedEntityIndex
+from .entity_resolver import EntityResolver
+from .metrics import Metrics, timed
+from .reloader import ConfigReloader
+from .target_validator import TARGET_KEYS, TargetValidator
+from .token_counter import estimate_tokens
+from .yaml_cache import YamlFileCache
+
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def _read(path):
-    """Read YAML helper."""
-    if not os.path.isfile(path):
-        return None
-
-    return load_yaml(path)
-
-
-def _write(path, data):
-    """Write YAML helper."""
-    # Do it before opening file. If dump causes error it will now not
-    # truncate the file.
-    contents = dump(data)
-    write_utf8_file_atomic(path, contents)
+def _upsert(items: list[dict[str, Any]], index: dict[str, int], config_key: str, value: dict[str, Any]) -> None:
+    """Replace the item with the id or append it, in O(1) with the index of the positions by id."""
+    if (position := index.get(config_key)) is not None:
+        items[position] = value
+    else:
+        index[config_key] = len(items)
+        items.append(value)
 
 
 class HaService:
-    def __init__(self, hass: HomeAssistant):
+    def __init__(self, hass: HomeAssistant, metrics: Metrics | None = None):
         self.hass = hass
+        self.metrics = metrics if metrics is not None else Metrics()
         self.mutation_lock = asyncio.Lock()
+        self.reloader = ConfigReloader(hass)
+        self.config_files = YamlFileCache()
+        # Bumped when services are registered or removed
+        self.services_generation = 0
+        self._unsub_services: list[Callable[[], None]] = []
+        # path -> (list document, position of every item by id), valid while the document is the cached one
+        self._id_indexes: dict[str, tuple[list[dict[str, Any]], dict[str, int]]] = {}
+        self.entity_index = ExposedEntityIndex(hass, self)
+        self.entity_resolver = EntityResolver(self.entity_index, self.get_all_exposed_entities)
+        self.target_validator = TargetValidator(hass, self.is_exposed)
 
     @callback
     def _get_registry_entries(
@@ -99,17 +115,11 @@ class HaService:
         return entity_entry, device_entry, area_entry
 
     async def _read_current_automation(self):
-        """Read the config."""
-        current = await self.hass.async_add_executor_job(_read, self.hass.config.path(AUTOMATION_CONFIG_PATH))
-        if not current:
-            current = []
-        return current
+        """Read the config, with the position of every automation by id."""
+        return await self._read_id_list(AUTOMATION_CONFIG_PATH)
 
-    def _write_automation_value(self, current_automation, config_key, new_value):
+    def _write_automation_value(self, current_automation, index, config_key, new_value):
         """Set value."""
-        _LOGGER.debug("current automation: %s", current_automation)
-        _LOGGER.debug("new value: %s", new_value)
-        _LOGGER.debug("config_key: %s", config_key)
         updated_value = {CONF_ID: config_key}
 
         # Iterate through some keys that we want to have ordered in the output
@@ -121,30 +131,15 @@ class HaService:
         # supporting more fields in the future.
         updated_value.update(new_value)
 
-        updated = False
-        for index, cur_value in enumerate(current_automation):
-            # When people copy paste their automations to the config file,
-            # they sometimes forget to add IDs. Fix it here.
-            if CONF_ID not in cur_value:
-                cur_value[CONF_ID] = uuid.uuid4().hex
-
-            elif cur_value[CONF_ID] == config_key:
-                current_automation[index] = updated_value
-                updated = True
-
-        if not updated:
-            current_automation.append(updated_value)
-
-        _LOGGER.info("current automation: %s", current_automation)
+        _upsert(current_automation, index, config_key, updated_value)
+        _LOGGER.debug("Set automation %s (%s), %s automations in total",
+                      config_key, updated_value.get("alias", ""), len(current_automation))
 
     async def _read_current_scenes(self):
-        """Read the config."""
-        current = await self.hass.async_add_executor_job(_read, self.hass.config.path(SCENE_CONFIG_PATH))
-        if not current:
-            current = []
-        return current
+        """Read the config, with the position of every scene by id."""
+        return await self._read_id_list(SCENE_CONFIG_PATH)
 
-    def _write_scene_value(self, current_scenes, config_key, new_value):
+    def _write_scene_value(self, current_scenes, index, config_key, new_value):
         """Set value."""
         updated_value = {CONF_ID: config_key}
         # Iterate through some keys that we want to have ordered in the output
@@ -156,79 +151,118 @@ class HaService:
         # supporting more fields in the future.
         updated_value.update(new_value)
 
-        updated = False
-        for index, cur_value in enumerate(current_scenes):
-            # When people copy paste their scenes to the config file,
+        _upsert(current_scenes, index, config_key, updated_value)
+        _LOGGER.debug("Set scene %s (%s), %s scenes in total",
+                      config_key, updated_value.get("name", ""), len(current_scenes))
+
+    async def _read_id_list(self, config_path: str) -> tuple[list[dict[str, Any]], dict[str, int], bool]:
+        """Read a list config, the position of every item by id and whether missing ids were added."""
+        path = self.hass.config.path(config_path)
+        current = await self.hass.async_add_executor_job(self.config_files.read, path)
+        if not current:
+            current = []
+        if (cached := self._id_indexes.get(path)) is not None and cached[0] is current:
+            return current, cached[1], False
+
+        # Parsed anew, index it once
+        index = {}
+        repaired = False
+        for position, cur_value in enumerate(current):
+            # When people copy paste their automations/scenes to the config file,
             # they sometimes forget to add IDs. Fix it here.
             if CONF_ID not in cur_value:
                 cur_value[CONF_ID] = uuid.uuid4().hex
+                repaired = True
+            index[cur_value[CONF_ID]] = position
+        if repaired:
+            _LOGGER.debug("Added missing ids in %s", config_path)
+        self._id_indexes[path] = (current, index)
+        return current, index, repaired
+
+    async def _async_write_config(self, config_path: str, document: Any, index: dict[str, int] | None = None) -> None:
+        path = self.hass.config.path(config_path)
+        await self.hass.async_add_executor_job(self.config_files.write, path, document)
+        if index is not None:
+            # The written document is the cached one now, keep its index
+            self._id_indexes[path] = (document, index)
+
+    async def async_setup(self) -> None:
+        """Fill the exposed entity index and start following changes."""
+        self.entity_index.async_setup()
+        self.entity_resolver.async_setup()
+        self.target_validator.async_setup()
+        self._unsub_services = [
+            self.hass.bus.async_listen(EVENT_SERVICE_REGISTERED, self._async_services_changed),
+            self.hass.bus.async_listen(EVENT_SERVICE_REMOVED, self._async_services_changed),
+        ]
 
-            elif cur_value[CONF_ID] == config_key:
-                current_scenes[index] = updated_value
-                updated = True
-
-        if not updated:
-            current_scenes.append(updated_value)
+    @callback
+    def async_unload(self) -> None:
+        for unsub in self._unsub_services:
+            unsub()
+        self._unsub_services = []
+        self.reloader.async_cancel()
+        self.target_validator.async_unload()
+        self.entity_resolver.async_unload()
+        self.entity_index.async_unload()
 
-    def _is_valid_entity_id(self, entity_id):
-        ent_reg = er.async_get(self.hass)
-        entity = ent_reg.async_get(entity_id)
-        return entity is not None
+    @callback
+    def _async_services_changed(self, event: Event) -> None:
+        self.services_generation += 1
 
-    def _is_valid_area_id(self, area_id):
-        area_reg = ar.async_get(self.hass)
-        area = area_reg.async_get_area(area_id)
-        return area is not None
+    @callback
+    def build_exposed_entity(self, state: State) -> dict[str, Any]:
+        """Describe an exposed entity, as returned by get_all_exposed_entities."""
+        entity_id = state.entity_id
+        entity_entry, device_entry, area_entry = self._get_registry_entries(entity_id)
+
+        aliases = []
+        if entity_entry and entity_entry.aliases:
+            aliases = entity_entry.aliases
+
+        area_id = ""
+        area_name = "UNKNOWN"
+        area_aliases = []
+        if area_entry:
+            area_id = area_entry.id
+            area_name = area_entry.name
+            area_aliases = area_entry.aliases
+
+        return {
+            "entity_id": entity_id,
+            "domain": state.domain,
+            "name": state.name,
+            "state": state.state,
+            "aliases": aliases,
+            "area_id": area_id,
+            "area_name": area_name,
+            "area_aliases": area_aliases
+        }
 
-    def _is_valid_device_id(self, entity_id):
-        dev_reg = dr.async_get(self.hass)
-        device = dev_reg.devices.get(entity_id)
-        return device is not None
+    @callback
+    def get_exposed_entities_generation(self) -> int | None:
+        """Changes when exposed entities, names, aliases or areas change, None if it can't be tracked."""
+        if not self.entity_index.ready:
+            return None
+        return self.entity_index.generation
 
     @callback
     def get_all_exposed_entities(self):
+        """Get all exposed entities, the returned items are shared and must not be modified."""
+        if self.entity_index.ready:
+            return self.entity_index.get_all()
+
         _LOGGER.debug("Getting all exposed entities")
-        states = [
-            state
+        return [
+            self.build_exposed_entity(state)
             for state in self.hass.states.async_all()
             if self.should_expose(state.entity_id)
         ]
 
-        exposed_entities = []
-        for state in states:
-            entity_id = state.entity_id
-            domain = state.domain
-            entity_entry, device_entry, area_entry = self._get_registry_entries(entity_id)
-
-            aliases = []
-            if entity_entry and entity_entry.aliases:
-                aliases = entity_entry.aliases
-
-            area_id = ""
-            area_name = "UNKNOWN"
-            area_aliases = []
-            if area_entry:
-                area_id = area_entry.id
-                area_name = area_entry.name
-                area_aliases = area_entry.aliases
-
-            exposed_entities.append(
-                {
-                    "entity_id": entity_id,
-                    "domain": domain,
-                    "name": state.name,
-                    "state": self.hass.states.get(entity_id).state,
-                    "aliases": aliases,
-                    "area_id": area_id,
-                    "area_name": area_name,
-                    "area_aliases": area_aliases
-                }
-            )
-        return exposed_entities
-
     @callback
-    def get_all_exposed_areas(self):
-        exposed_entities = self.get_all_exposed_entities()
+    def get_all_exposed_areas(self, exposed_entities: list[dict[str, Any]] | None = None):
+        if exposed_entities is None:
+            exposed_entities = self.get_all_exposed_entities()
         if len(exposed_entities) == 0:
             return ""
 
@@ -251,49 +285,110 @@ class HaService:
         return areas
 
     @callback
-    def get_exposed_entities_csv(self, area_id: str | None = None, domain: str | None = None):
-        _LOGGER.debug("Getting all exposed entities csv, area_id: %s, domain: %s", area_id, domain)
+    def get_exposed_entities_csv(
+            self,
+            area_id: str | None = None,
+            domain: str | None = None,
+            name: str | None = None,
+            limit: int | None = None,
+    ):
+        """Compact csv of the exposed entities, grouped so that area and domain are written once per group."""
+        return self.build_exposed_entities_csv(area_id, domain, name, limit)[0]
+
+    @callback
+    @timed("ha:build_exposed_entities_csv")
+    def build_exposed_entities_csv(
+            self,
+            area_id: str | None = None,
+            domain: str | None = None,
+            name: str | None = None,
+            limit: int | None = None,
+    ) -> tuple[str, list[dict[str, Any]]]:
+        """get_exposed_entities_csv, together with the entities of its rows."""
+        _LOGGER.debug("Getting all exposed entities csv, area_id: %s, domain: %s, name: %s", area_id, domain, name)
         all_exposed_entities = self.get_all_exposed_entities()
 
-        need_fields = ["entity_id", "name", "aliases", "state"]
         filter_funcs = []
         if area_id is not None and area_id != "":
             filter_funcs.append(lambda entity: entity["area_id"] == area_id)
-        else:
-            need_fields.append("area_name")
-
         if domain is not None and domain != "":
             filter_funcs.append(lambda entity: entity["domain"] == domain)
-        else:
-            need_fields.append("domain")
-
-        exposed_entities = []
-        for exposed_entity in all_exposed_entities:
-            is_exclude = False
-            for filter_func in filter_funcs:
-                if not filter_func(exposed_entity):
-                    is_exclude = True
-                    break
-            if is_exclude:
-                continue
-            exposed_entities.append(exposed_entity)
+        if name is not None and name.strip() != "":
+            fragment = name.strip().lower()
+            filter_funcs.append(
+                lambda entity: any(fragment in n.lower() for n in [entity["name"], *entity["aliases"]] if n)
+            )
+
+        exposed_entities = [
+            exposed_entity
+            for exposed_entity in all_exposed_entities
+            if all(filter_func(exposed_entity) for filter_func in filter_funcs)
+        ]
         if len(exposed_entities) == 0:
-            return "No exposed entities"
+            return "No exposed entities", []
+
+        if limit is None or limit <= 0:
+            limit = EXPOSED_ENTITIES_ROW_LIMIT
+        exposed_entities.sort(
+            key=lambda entity: (entity["area_id"] == "", entity["area_name"], entity["area_id"], entity["domain"])
+        )
 
         csv_data = io.StringIO()
-        writer = csv.writer(csv_data)
-        writer.writerow(need_fields)
+        writer = csv.writer(csv_data, lineterminator="\n")
+        writer.writerow(["entity_id", "name", "aliases", "state"])
+        group = None
+        for exposed_entity in exposed_entities[:limit]:
+            entity_group = (exposed_entity["area_id"], exposed_entity["domain"])
+            if entity_group != group:
+                group = entity_group
+                area = exposed_entity["area_name"] if exposed_entity["area_id"] else "no area"
+                csv_data.write(f"# area: {area} ({exposed_entity['area_id']}), domain: {exposed_entity['domain']}\n")
+            writer.writerow([
+                exposed_entity["entity_id"],
+                exposed_entity["name"],
+                "/".join(exposed_entity["aliases"]),
+                exposed_entity["state"],
+            ])
+
+        if len(exposed_entities) > limit:
+            csv_data.write(
+                f"# {len(exposed_entities) - limit} more entities, narrow down with area_id, domain or name\n"
+            )
 
-        for exposed_entity in exposed_entities:
-            row = []
-            for field in need_fields:
-                row.append(exposed_entity[field])
-            writer.writerow(row)
-
-        return f"""```csv
-        {csv_data.getvalue()}
-        ```
-        """
+        result = f"```csv\n{csv_data.getvalue()}```"
+        _LOGGER.debug("Exposed entities csv: %s rows, %s bytes, ~%s tokens",
+                      min(len(exposed_entities), limit), len(result.encode()), estimate_tokens(result))
+        return result, exposed_entities[:limit]
+
+    @callback
+    def states_unchanged(self, states: tuple[tuple[str, str], ...]) -> bool:
+        """Whether the exposed entities still have the given (entity_id, state)."""
+        for entity_id, state in states:
+            entity = self.entity_index.get(entity_id)
+            if entity is None or entity["state"] != state:
+                return False
+        return True
+
+    @callback
+    @timed("ha:search_exposed_entities")
+    def search_exposed_entities(self, query: str, limit: int | None = None):
+        _LOGGER.debug("Searching exposed entities: %s", query)
+        if not query or query.strip() == "":
+            return "You need to pass in a name, alias or area to search for"
+        if limit is None or limit <= 0:
+            limit = SEARCH_ENTITIES_LIMIT
+
+        matches = self.entity_resolver.search(query, limit)
+        if len(matches) == 0:
+            return "No matching exposed entities"
+
+        csv_data = io.StringIO()
+        writer = csv.writer(csv_data, lineterminator="\n")
+        writer.writerow(["entity_id", "name", "area_name", "score"])
+        for entity_id, score in matches:
+            entity = self.entity_index.get(entity_id) or {}
+            writer.writerow([entity_id, entity.get("name", ""), entity.get("area_name", ""), score])
+        return f"```csv\n{csv_data.getvalue()}```"
 
     @callback
     def should_expose(self, entity_id: str) -> bool:
@@ -302,27 +397,142 @@ class HaService:
 
         return async_should_expose(self.hass, CONVERSATION_DOMAIN, entity_id)
 
+    @callback
+    def is_exposed(self, entity_id: str) -> bool:
+        """should_expose, answered by the exposed entity index when it is ready."""
+        if self.entity_index.ready:
+            return self.entity_index.get(entity_id) is not None
+        return self.should_expose(entity_id)
+
+    @timed("ha:add_automation")
     async def add_automation(self, new_automation=None):
         _LOGGER.debug("Adding automation: %s", new_automation)
         if new_automation is None:
             return "You need to pass in new automation as a param named new_automation"
+        if (error := await self._async_validate_automation(new_automation)) is not None:
+            return error
+
+        async with self.mutation_lock:
+            # load & update
+            current_automation, index, repaired = await self._read_current_automation()
+            automation_id = uuid.uuid4().hex
+            self._write_automation_value(current_automation, index, automation_id, new_automation)
+
+            await self._async_write_config(AUTOMATION_CONFIG_PATH, current_automation, index)
+
+        if repaired:
+            # Other automations got ids, they need to be reloaded as well
+            self.reloader.async_schedule(AUTOMATION_DOMAIN)
+        else:
+            # Only set up the new automation, the others keep running
+            await self.reloader.async_reload_item(AUTOMATION_DOMAIN, {CONF_ID: automation_id})
+        return True
+
+    async def _async_validate_automation(self, new_automation) -> str | None:
         try:
             await async_validate_automation_config_item(self.hass, "", new_automation)
         except (vol.Invalid, HomeAssistantError) as err:
             _LOGGER.error(err)
             return f"new_automation malformed: {err}"
+        return None
 
-        async with self.mutation_lock:
-            # load & update
-            current_automation = await self._read_current_automation()
-            self._write_automation_value(current_automation, uuid.uuid4().hex, new_automation)
+    async def _async_validate_script(self, script_id, new_script) -> str | None:
+        try:
+            await async_validate_script_config_item(self.hass, script_id, new_script)
+        except (vol.Invalid, HomeAssistantError) as err:
+            _LOGGER.error(err)
+            return f"new_script malformed: {err}"
+        return None
+
+    def _validate_scene(self, name: str, entities: dict[str, Any] | None) -> str | None:
+        if name is None or name == "":
+            return "You need to specify a name of the new scene"
+        if entities is None or len(entities) == 0:
+            return "You need to specify at least one entity in the new scene"
 
-            await self.hass.async_add_executor_job(_write, self.hass.config.path(AUTOMATION_CONFIG_PATH),
-                                                   current_automation)
+        if errors := self.target_validator.validate({"entity_id": list(entities)}):
+            return "\n".join(["The keys of entities should be entity_ids", *errors])
+        try:
+            SCENE_CONFIG_SCHEMA({"name": name, "entities": entities})
+        except (vol.Invalid, HomeAssistantError) as err:
+            _LOGGER.error(err)
+            return f"new_scene malformed: {err}"
+        return None
 
-        await self.hass.services.async_call(AUTOMATION_DOMAIN, SERVICE_RELOAD)
+    @timed("ha:add_items")
+    async def add_items(
+            self,
+            automations: list[dict[str, Any]] | None = None,
+            scripts: dict[str, dict[str, Any]] | None = None,
+            scenes: list[dict[str, Any]] | None = None,
+    ):
+        """Add several automations, scripts and scenes at once, nothing is added unless all of them are valid.
+
+        Every affected file is written once and every affected domain reloaded once. When a write
+        fails, the files written before it are restored.
+        """
+        _LOGGER.debug("Adding automations: %s, scripts: %s, scenes: %s", automations, scripts, scenes)
+        automations = automations or []
+        scripts = scripts or {}
+        scenes = scenes or []
+        if not (automations or scripts or scenes):
+            return "You need to pass in at least one automation, script or scene"
+
+        errors = []
+        for index, automation in enumerate(automations, 1):
+            if (error := await self._async_validate_automation(automation)) is not None:
+                errors.append(f"automations[{index}]: {error}")
+        for script_id, script in scripts.items():
+            if (error := await self._async_validate_script(script_id, script)) is not None:
+                errors.append(f"scripts[{script_id}]: {error}")
+        for index, scene in enumerate(scenes, 1):
+            if (error := self._validate_scene(scene.get("name"), scene.get("entities"))) is not None:
+                errors.append(f"scenes[{index}]: {error}")
+        if errors:
+            return "Nothing was added, fix these items first:\n" + "\n".join(errors)
+
+        async with self.mutation_lock:
+            # domain, path, (current document, index), (updated copy, index);
+            # the cached documents stay untouched until written
+            staged = []
+            if automations:
+                current_automation, index, _ = await self._read_current_automation()
+                updated_automation, updated_index = list(current_automation), dict(index)
+                for automation in automations:
+                    self._write_automation_value(updated_automation, updated_index, uuid.uuid4().hex, automation)
+                staged.append((AUTOMATION_DOMAIN, AUTOMATION_CONFIG_PATH,
+                               (current_automation, index), (updated_automation, updated_index)))
+            if scripts:
+                current_script = await self.read_current_script()
+                staged.append((SCRIPT_DOMAIN, SCRIPT_CONFIG_PATH,
+                               (current_script, None), ({**current_script, **scripts}, None)))
+            if scenes:
+                current_scenes, index, _ = await self._read_current_scenes()
+                updated_scenes, updated_index = list(current_scenes), dict(index)
+                for scene in scenes:
+                    self._write_scene_value(
+                        updated_scenes, updated_index, uuid.uuid4().hex,
+                        {"name": scene["name"], "entities": scene["entities"]}
+                    )
+                staged.append((SCENE_DOMAIN, SCENE_CONFIG_PATH,
+                               (current_scenes, index), (updated_scenes, updated_index)))
+
+            written = []
+            try:
+                for _, config_path, current, updated in staged:
+                    await self._async_write_config(config_path, *updated)
+                    written.append((config_path, current))
+            except (OSError, HomeAssistantError) as err:
+                _LOGGER.error("Adding items failed, restoring %s files: %s", len(written), err)
+                for config_path, current in written:
+                    await self._async_write_config(config_path, *current)
+                return f"Nothing was added, writing the config failed: {err}"
+
+        for domain, *_ in staged:
+            self.reloader.async_schedule(domain)
         return True
 
+    @timed("ha:call_service")
     async def call_service(
             self,
             domain: str,
@@ -330,39 +540,56 @@ class HaService:
             service_data: dict[str, Any] | None = None,
     ):
         _LOGGER.debug("Calling service: %s %s %s", domain, service, service_data)
-        if not self.hass.services.has_service(domain, service):
-            return f"Unknown service"
-
-        valid_service_data = False
         if service_data is None:
             service_data = {}
+        # The call may target an item added in this run, which is only known once it is reloaded
+        await self.reloader.async_flush()
+        if (error := self._validate_service_call(domain, service, service_data)) is not None:
+            return error
+        return await self._async_call_service(domain, service, service_data)
+
+    @timed("ha:call_services")
+    async def call_services(self, calls: list[dict[str, Any]]):
+        """Call several services at once, nothing is called unless every call is valid."""
+        _LOGGER.debug("Calling services: %s", calls)
+        if not calls:
+            return "No service calls given"
+
+        calls = [{**call, "service_data": call.get("service_data") or {}} for call in calls]
+        if errors := await self.validate_service_calls(calls):
+            return "No service was called, fix these calls first:\n" + "\n".join(errors)
+
+        results = await asyncio.gather(*(
+            self._async_call_service(call["domain"], call["service"], call["service_data"])
+            for call in calls
+        ))
+        return "\n".join(
+            f"{index}. {call['domain']}.{call['service']}: {'ok' if result is True else result}"
+            for index, (call, result) in enumerate(zip(calls, results), 1)
+        )
+
+    async def validate_service_calls(self, calls: list[dict[str, Any]]) -> list[str]:
+        """The reasons of the calls that can't be made, numbered like the calls."""
+        # The calls may target an item added in this run, which is only known once it is reloaded
+        await self.reloader.async_flush()
+        errors = []
+        for index, call in enumerate(calls, 1):
+            if (error := self._validate_service_call(call["domain"], call["service"], call["service_data"])) is not None:
+                errors.append(f"{index}. {call['domain']}.{call['service']}: {error}")
+        return errors
+
+    def _validate_service_call(self, domain: str, service: str, service_data: dict[str, Any]) -> str | None:
+        """The reason the call can't be made, None if it is valid."""
+        if not self.hass.services.has_service(domain, service):
+            return f"Unknown service"
 
-        if "entity_id" in service_data:
-            entity_id = service_data["entity_id"]
-            if not isinstance(entity_id, list):
-                entity_id = [entity_id]
-            for e_id in entity_id:
-                if not self._is_valid_entity_id(e_id):
-                    return f"Unknown entity_id: {e_id}, you should reacquire exposed entities, entity_id should be of string type and the format should conform to domain.unique_id, like lgiht.123"
-                if not self.should_expose(e_id):
-                    return f"Unexposed entity {e_id}"
-            valid_service_data = True
-
-        if "area_id" in service_data:
-            valid_service_data = True
-            area_id = service_data["area_id"]
-            if not self._is_valid_area_id(area_id):
-                return f"Unknown area_id: {area_id}, you should reacquire exposed entities"
-
-        if "device_id" in service_data:
-            valid_service_data = True
-            device_id = service_data["device_id"]
-            if not self._is_valid_device_id(device_id):
-                return f"Unknown device_id: {device_id}, you should reacquire exposed entities"
-
-        if not valid_service_data:
+        if not any(key in service_data for key in TARGET_KEYS):
             return f"Invalid service data: {service_data}, must contain at least one of the following: area_id, device_id, entity_id."
+        if errors := self.target_validator.validate(service_data):
+            return "\n".join(errors)
+        return None
 
+    async def _async_call_service(self, domain: str, service: str, service_data: dict[str, Any]):
         try:
             await self.hass.services.async_call(
                 domain=domain,
@@ -375,77 +602,56 @@ class HaService:
         except Exception as e:
             return str(e)
 
+    @timed("ha:get_available_services")
     async def get_available_services(self, domain: str) -> dict[str, Service]:
         _LOGGER.debug("Getting available services for %s", domain)
         all_services = self.hass.services.async_services()
         return all_services.get(domain.lower(), {})
 
+    @timed("ha:add_script")
     async def add_script(self, script_id, new_script=None):
         _LOGGER.debug("Adding script: %s", new_script)
         if new_script is None:
             return "You need to pass in new script as a param named new_script"
-        try:
-            await async_validate_script_config_item(self.hass, script_id, new_script)
-        except (vol.Invalid, HomeAssistantError) as err:
-            _LOGGER.error(err)
-            return f"new_script malformed: {err}"
+        if (error := await self._async_validate_script(script_id, new_script)) is not None:
+            return error
 
         async with self.mutation_lock:
             # load & update
             current_script = await self.read_current_script()
             current_script[script_id] = new_script
 
-            await self.hass.async_add_executor_job(_write, self.hass.config.path(SCRIPT_CONFIG_PATH),
-                                                   current_script)
+            await self._async_write_config(SCRIPT_CONFIG_PATH, current_script)
 
-        await self.hass.services.async_call(SCRIPT_DOMAIN, SERVICE_RELOAD)
+        self.reloader.async_schedule(SCRIPT_DOMAIN)
         return True
 
     async def read_current_script(self):
-        """Read the config."""
-        current = await self.hass.async_add_executor_job(_read, self.hass.config.path(SCRIPT_CONFIG_PATH))
+        """Read the config, the returned document is cached and must only be modified under mutation_lock."""
+        current = await self.hass.async_add_executor_job(
+            self.config_files.read, self.hass.config.path(SCRIPT_CONFIG_PATH)
+        )
         if not current:
             current = {}
         return current
 
+    @timed("ha:add_scene")
     async def add_scene(self, name: str = "", entities: dict[str, Any] = None):
         _LOGGER.debug("Adding scene, name: %s, entities: %s", name, entities)
-        if name is None or name == "":
-            return "You need to specify a name of the new scene"
-        if entities is None or len(entities) == 0:
-            return "You need to specify at least one entity in the new scene"
-
-        for entity_id in entities.keys():
-            if not self._is_valid_entity_id(entity_id):
-                return f"Unknown entity_id: {entity_id}, the key of entities should be entity_id, of string type and the format should conform to domain.unique_id, like lgiht.123"
-            if not self.should_expose(entity_id):
-                return f"Unexposed entity {entity_id}"
-
+        if (error := self._validate_scene(name, entities)) is not None:
+            return error
         new_scene = {
             "name": name,
             "entities": entities
         }
-        try:
-            SCENE_CONFIG_SCHEMA(new_scene)
-        except (vol.Invalid, HomeAssistantError) as err:
-            _LOGGER.error(err)
-            return f"new_scene malformed: {err}"
-
-        entities = new_scene.get("entities", [])
-        for entity_id in entities:
-            if not self._is_valid_entity_id(entity_id):
-                return f"Unknown entity_id: {entity_id}, you should reacquire exposed entities"
-            if not self.should_expose(entity_id):
-                return f"Unexposed entity {entity_id}"
 
         async with self.mutation_lock:
             # load & update
-            current_scenes = await self._read_current_scenes()
-            self._write_scene_value(current_scenes, uuid.uuid4().hex, new_scene)
+            current_scenes, index, _ = await self._read_current_scenes()
+            self._write_scene_value(current_scenes, index, uuid.uuid4().hex, new_scene)
 
-            await self.hass.async_add_executor_job(_write, self.hass.config.path(SCENE_CONFIG_PATH),
-                                                   current_scenes)
+            await self._async_write_config(SCENE_CONFIG_PATH, current_scenes, index)
 
-        await self.hass.services.async_call(SCENE_DOMAIN, SERVICE_RELOAD)
+        self.reloader.async_schedule(SCENE_DOMAIN)
         return True
 
@@ -0,0 +1,282 @@
+"""Local matcher that executes simple device commands without asking the LLM."""
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+
+if TYPE_CHECKING:
+    from .ha_service import HaService
+
+_LOGGER = logging.getLogger(__name__)
+
+ACTION_ON = "on"
+ACTION_OFF = "off"
+ACTION_TOGGLE = "toggle"
+ACTION_OPEN = "open"
+ACTION_CLOSE = "close"
+
+# Leading verb phrases, longest first when matching
+_PREFIX_VERBS = {
+    "turn on": ACTION_ON,
+    "switch on": ACTION_ON,
+    "turn off": ACTION_OFF,
+    "switch off": ACTION_OFF,
+    "toggle": ACTION_TOGGLE,
+    "open": ACTION_OPEN,
+    "close": ACTION_CLOSE,
+    "打开": ACTION_ON,
+    "开启": ACTION_ON,
+    "关闭": ACTION_OFF,
+    "关掉": ACTION_OFF,
+    "关上": ACTION_OFF,
+    "切换": ACTION_TOGGLE,
+}
+# "turn the kitchen light on", "把客厅灯打开"
+_SPLIT_VERBS = {
+    ("turn ", " on"): ACTION_ON,
+    ("switch ", " on"): ACTION_ON,
+    ("turn ", " off"): ACTION_OFF,
+    ("switch ", " off"): ACTION_OFF,
+}
+_SUFFIX_VERBS = {verb: action for verb, action in _PREFIX_VERBS.items() if not verb.isascii()}
+
+# Locks and alarms are deliberately left to the LLM, which asks for confirmation
+_SERVICES = {
+    ACTION_ON: {
+        "light": "turn_on", "switch": "turn_on", "fan": "turn_on", "input_boolean": "turn_on",
+        "media_player": "turn_on", "climate": "turn_on", "humidifier": "turn_on", "cover": "open_cover",
+    },
+    ACTION_OFF: {
+        "light": "turn_off", "switch": "turn_off", "fan": "turn_off", "input_boolean": "turn_off",
+        "media_player": "turn_off", "climate": "turn_off", "humidifier": "turn_off", "cover": "close_cover",
+    },
+    ACTION_TOGGLE: {
+        "light": "toggle", "switch": "toggle", "fan": "toggle", "input_boolean": "toggle", "cover": "toggle",
+    },
+    ACTION_OPEN: {"cover": "open_cover", "valve": "open_valve"},
+    ACTION_CLOSE: {"cover": "close_cover", "valve": "close_valve"},
+}
+_DONE = {
+    ACTION_ON: "Turned on",
+    ACTION_OFF: "Turned off",
+    ACTION_TOGGLE: "Toggled",
+    ACTION_OPEN: "Opened",
+    ACTION_CLOSE: "Closed",
+}
+
+# Words that name every entity of a domain in an area, "turn off the kitchen lights"
+_DOMAIN_WORDS = {
+    "light": "light", "lights": "light", "lamp": "light", "lamps": "light", "灯": "light", "灯光": "light",
+    "fan": "fan", "fans": "fan", "风扇": "fan",
+    "switch": "switch", "switches": "switch", "开关": "switch",
+    "cover": "cover", "covers": "cover", "blind": "cover", "blinds": "cover", "curtain": "cover",
+    "curtains": "cover", "shade": "cover", "shades": "cover", "窗帘": "cover",
+}
+
+_POLITE_PREFIXES = ("please ", "can you ", "could you ", "would you ", "请帮我", "帮我", "麻烦", "请")
+_POLITE_SUFFIXES = (" please", " for me", "吧", "一下")
+_FILLERS_RE = re.compile(r"^(?:the|all|all the|my) ")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    text = _PUNCTUATION_RE.sub(" ", text.lower())
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def _strip_filler(text: str) -> str:
+    text = _FILLERS_RE.sub("", text)
+    # 客厅的灯
+    return text.replace("的", "").strip()
+
+
+@dataclass
+class FastPathMatch:
+    action: str
+    verb: str
+    # domain -> service, entity_ids
+    calls: dict[str, tuple[str, list[str]]] = field(default_factory=dict)
+    # entity_id -> name
+    names: dict[str, str] = field(default_factory=dict)
+
+
+class _Lookup:
+    """Normalized names and aliases of the exposed entities and areas."""
+
+    def __init__(self, exposed_entities: list[dict[str, Any]]):
+        self.names: dict[str, set[str]] = {}
+        self.areas: dict[str, str] = {}
+        self.area_names: dict[str, dict[str, set[str]]] = {}
+        self.area_domains: dict[tuple[str, str], list[str]] = {}
+        self.entities: dict[str, tuple[str, str]] = {}
+
+        for entity in exposed_entities:
+            entity_id = entity["entity_id"]
+            self.entities[entity_id] = (entity["domain"], entity["name"])
+            keys = {normalize(name) for name in [entity["name"], *entity["aliases"]] if name}
+            for key in keys:
+                self.names.setdefault(key, set()).add(entity_id)
+
+            if not (area_id := entity["area_id"]):
+                continue
+            for area_key in {normalize(name) for name in [entity["area_name"], *entity["area_aliases"]] if name}:
+                self.areas[area_key] = area_id
+            area_names = self.area_names.setdefault(area_id, {})
+            for key in keys:
+                area_names.setdefault(key, set()).add(entity_id)
+            self.area_domains.setdefault((area_id, entity["domain"]), []).append(entity_id)
+
+        # Longest area names first, "living room lamp" must not match the "living" area
+        self.area_keys = sorted(self.areas, key=len, reverse=True)
+
+
+class FastPathMatcher:
+    """Resolve "verb + entity/area" commands locally, everything else goes to the LLM."""
+
+    def __init__(self, ha_service: HaService):
+        self.ha_service = ha_service
+        self.hits = 0
+        self.misses = 0
+        self._lookup: _Lookup | None = None
+        self._lookup_generation: int | None = None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @callback
+    def _get_lookup(self) -> _Lookup:
+        generation = self.ha_service.get_exposed_entities_generation()
+        if self._lookup is None or generation is None or generation != self._lookup_generation:
+            self._lookup = _Lookup(self.ha_service.get_all_exposed_entities())
+            self._lookup_generation = generation
+        return self._lookup
+
+    @callback
+    def match(self, text: str) -> FastPathMatch | None:
+        text = normalize(text)
+        for prefix in _POLITE_PREFIXES:
+            if text.startswith(prefix):
+                text = text[len(prefix):].strip()
+        for suffix in _POLITE_SUFFIXES:
+            if text.endswith(suffix):
+                text = text[:-len(suffix)].strip()
+
+        parsed = self._parse_verb(text)
+        if parsed is None:
+            return None
+        verb, action, target = parsed
+        target = _strip_filler(target)
+        if not target:
+            return None
+
+        lookup = self._get_lookup()
+        entity_ids = self._resolve(lookup, target)
+        if not entity_ids:
+            return None
+
+        result = FastPathMatch(action=action, verb=verb)
+        for entity_id in sorted(entity_ids):
+            domain, name = lookup.entities[entity_id]
+            if (service := _SERVICES[action].get(domain)) is None:
+                return None
+            result.calls.setdefault(domain, (service, []))[1].append(entity_id)
+            result.names[entity_id] = name
+        return result
+
+    @staticmethod
+    def _parse_verb(text: str) -> tuple[str, str, str] | None:
+        for (start, end), action in _SPLIT_VERBS.items():
+            if text.startswith(start) and text.endswith(end) and len(text) > len(start) + len(end):
+                return start + end.strip(), action, text[len(start):-len(end)]
+        for verb in sorted(_PREFIX_VERBS, key=len, reverse=True):
+            if not text.startswith(verb):
+                continue
+            rest = text[len(verb):]
+            if verb.isascii() and rest and not rest.startswith(" "):
+                # "opening hours" is not "open"
+                continue
+            return verb, _PREFIX_VERBS[verb], rest.strip()
+        for verb in sorted(_SUFFIX_VERBS, key=len, reverse=True):
+            if text.endswith(verb):
+                rest = text[:-len(verb)]
+                for particle in ("把", "将"):
+                    rest = rest.removeprefix(particle)
+                return verb, _SUFFIX_VERBS[verb], rest.strip()
+        return None
+
+    @staticmethod
+    def _resolve(lookup: _Lookup, target: str) -> set[str] | None:
+        """Entities meant by the target, None when nothing or more than one thing fits."""
+        if (entity_ids := lookup.names.get(target)) is not None:
+            return entity_ids if len(entity_ids) == 1 else None
+
+        # "lights in the kitchen"
+        if " in " in target:
+            rest, _, area = target.rpartition(" in ")
+            target = f"{_strip_filler(area)} {rest}"
+
+        for area_key in lookup.area_keys:
+            if not target.startswith(area_key):
+                continue
+            rest = _strip_filler(target[len(area_key):])
+            if not rest:
+                return None
+            area_id = lookup.areas[area_key]
+            if (entity_ids := lookup.area_names.get(area_id, {}).get(rest)) is not None:
+                return entity_ids if len(entity_ids) == 1 else None
+            if (domain := _DOMAIN_WORDS.get(rest)) is not None:
+                return set(lookup.area_domains.get((area_id, domain), ())) or None
+            return None
+        return None
+
+    async def async_handle(self, text: str) -> str | None:
+        """Execute a simple command, the speech to answer or None to hand over to the LLM."""
+        result = self.match(text)
+        if result is None:
+            self.misses += 1
+            _LOGGER.debug("Fast path miss, hit rate %.2f", self.hit_rate)
+            return None
+
+        calls = [
+            {"domain": domain, "service": service, "service_data": {"entity_id": entity_ids}}
+            for domain, (service, entity_ids) in result.calls.items()
+        ]
+        if errors := await self.ha_service.validate_service_calls(calls):
+            # Nothing was called, the LLM can explain or try something else
+            _LOGGER.debug("Fast path calls are invalid: %s", errors)
+            self.misses += 1
+            return None
+
+        done: list[str] = []
+        failed: list[str] = []
+        for call in calls:
+            response = await self.ha_service.call_service(call["domain"], call["service"], call["service_data"])
+            entity_ids = call["service_data"]["entity_id"]
+            if response is True:
+                done.extend(entity_ids)
+            else:
+                _LOGGER.debug("Fast path call %s.%s failed: %s", call["domain"], call["service"], response)
+                failed.extend(entity_ids)
+        if not done:
+            self.misses += 1
+            return None
+
+        # Once something was called the turn is answered here, the LLM would call it again
+        self.hits += 1
+        _LOGGER.debug("Fast path hit: %s %s, hit rate %.2f", result.verb, result.calls, self.hit_rate)
+        names = ", ".join(result.names[entity_id] for entity_id in done)
+        failed_names = ", ".join(result.names[entity_id] for entity_id in failed)
+        if result.verb.isascii():
+            if failed:
+                return f"{_DONE[result.action]} {names}, but could not {result.verb} {failed_names}."
+            return f"{_DONE[result.action]} {names}."
+        if failed:
+            return f"已{result.verb}{names}，但{failed_names}{result.verb}失败。"
+        return f"已{result.verb}{names}。"
@@ -0,0 +1,79 @@
+from langchain.agents import (
+    AgentExecutor,
+    create_openai_tools_agent
+)
+from langchain.agents.format_scratchpad import format_log_to_str
+from langchain.agents.output_parsers import JSONAgentOutputParser
+from langchain.prompts import (
+    ChatPromptTemplate,
+    MessagesPlaceholder
+)
+from langchain.schema.runnable import RunnablePassthrough
+from langchain.tools.render import render_text_description_and_args
+
+from ..const import (
+    MODEL_OPENAI,
+    OPENAI_AGENT_SYSTEM_PROMPT,
+    STRUCTURED_AGENT_SYSTEM_PROMPT
+)
+
+# The rendered system prompt changes every turn (exposed areas, states...), so it is fed
+# into the cached prompt template as a plain variable instead of being baked into it.
+SYSTEM_PROMPT_KEY = "system_prompt"
+
+
+def get_agent_system_prompt(model_type: str, tools: list) -> str:
+    """Agent fragment injected into the system prompt template as agent_system_prompt.
+
+    The structured chat fragment is formatted here once, so that the per-turn system prompt
+    is a literal string and never goes through f-string formatting again.
+    """
+    if model_type == MODEL_OPENAI:
+        return OPENAI_AGENT_SYSTEM_PROMPT
+    return STRUCTURED_AGENT_SYSTEM_PROMPT.format(
+        tools=render_text_description_and_args(list(tools)),
+        tool_names=", ".join([t.name for t in tools]),
+    )
+
+
+def build_agent_executor(llm, tools: list, model_type: str, human_prompt: str, max_iterations: int):
+    """Build the agent pipeline, meant to be built once and reused across turns.
+
+    Per turn only `input`, `system_prompt` and the conversation's `chat_history` need to be
+    passed to `ainvoke`. The executor has no memory of its own, it is shared by all conversations.
+    """
+    if model_type == MODEL_OPENAI:
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "{%s}" % SYSTEM_PROMPT_KEY),
+            MessagesPlaceholder('chat_history'),
+            ("human", human_prompt),
+            MessagesPlaceholder('agent_scratchpad'),
+        ])
+        agent = create_openai_tools_agent(
+            llm=llm,
+            tools=tools,
+            prompt=prompt
+        )
+    else:
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "{%s}" % SYSTEM_PROMPT_KEY),
+            MessagesPlaceholder('chat_history'),
+            ("human", human_prompt)
+        ])
+        # Same pipeline as create_structured_chat_agent, which insists on {tools} and {tool_names}
+        # being prompt variables; they are already part of the rendered system prompt here.
+        agent = (
+            RunnablePassthrough.assign(
+                agent_scratchpad=lambda x: format_log_to_str(x["intermediate_steps"]),
+            )
+            | prompt
+            | llm.bind(stop=["Observation"])
+            | JSONAgentOutputParser()
+        )
+
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        max_iterations=max_iterations,
+        handle_parsing_errors=True
+    )
@@ -1,8 +1,14 @@
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools import StructuredTool
 from ..ha_service import HaService
+from .tool_cache import MISSING, ToolResultCache
 from typing import Any
 
+# Results of the read-only tools kept across agent runs
+TOOL_CACHE_SIZE = 64
+# Tools that change nothing in Home Assistant
+READ_ONLY_TOOLS = frozenset({"get_all_exposed_entities", "search_exposed_entities", "get_domains_services"})
+
 
 class HAServiceCallInput(BaseModel):
     domain: str = Field(description="domain in Home Assistant")
@@ -13,6 +19,10 @@ class HAServiceCallInput(BaseModel):
     )
 
 
+class HAServiceCallBatchInput(BaseModel):
+    calls: list[HAServiceCallInput] = Field(description="the service calls to make, they are run at the same time")
+
+
 class HAGetAvailableServicesInput(BaseModel):
     domain: str = Field(description="domain in Home Assistant")
 
@@ -20,6 +30,13 @@ class HAGetAvailableServicesInput(BaseModel):
 class HAGetExposedEntitiesInput(BaseModel):
     area_id: str = Field(description="optional, area_id in Home Assistant, corresponding to the area where the entities you want to query is located", default=None)
     domain: str = Field(description="optional, domain in Home Assistant, corresponding to the entities you want to query", default=None)
+    name: str = Field(description="optional, part of the name or alias of the entities you want to query", default=None)
+    limit: int = Field(description="optional, maximum number of entities to return", default=None)
+
+
+class HASearchExposedEntitiesInput(BaseModel):
+    query: str = Field(description="natural language name of the device or entity, can include the area, like 'kitchen ceiling light'")
+    limit: int = Field(description="optional, maximum number of candidates to return", default=None)
 
 
 class HAAddAutomationInput(BaseModel):
@@ -36,9 +53,16 @@ class HAAddSceneInput(BaseModel):
     entities: dict[str, Any] = Field(description="required, entities to control and their desired state, key is entity_id.", default=None)
 
 
+class HAAddItemsInput(BaseModel):
+    automations: list[dict[str, Any]] = Field(description="optional, the automations to be added, each should be a valid Home Assistant config item", default=None)
+    scripts: dict[str, dict[str, Any]] = Field(description="optional, the scripts to be added, key is the script_id (letters, numbers and underscore only), value is a valid Home Assistant config item", default=None)
+    scenes: list[HAAddSceneInput] = Field(description="optional, the scenes to be added", default=None)
+
+
 class HAServiceCallToolkit(object):
     def __init__(self, ha_service: HaService):
         self.ha_service = ha_service
+        self.cache = ToolResultCache(TOOL_CACHE_SIZE)
         self.tools = []
         self.build_tools()
 
@@ -48,13 +72,51 @@ class HAServiceCallToolkit(object):
     def build_tools(self):
         self.tools = [
             self.build_get_exposed_entities_tool(),
+            self.build_search_exposed_entities_tool(),
             self.build_get_available_services_tool(),
             self.build_service_call_tool(),
+            self.build_service_call_batch_tool(),
             self.build_add_automation_tool(),
             self.build_add_script_tool(),
-            self.build_add_scene_tool()
+            self.build_add_scene_tool(),
+            self.build_add_items_tool()
         ]
 
+    # The wrappers are coroutines so that langchain runs them on the event loop, not in a worker thread:
+    # the tool cache, the metrics and the entity index are only safe to use from the loop
+    async def get_exposed_entities_csv(self, area_id=None, domain=None, name=None, limit=None):
+        generation = self.ha_service.get_exposed_entities_generation()
+        if generation is None:
+            # Changes can't be tracked
+            return self.ha_service.get_exposed_entities_csv(area_id, domain, name, limit)
+
+        key = (area_id, domain, name, limit, generation)
+        if (result := self.cache.get("get_all_exposed_entities", key)) is not MISSING:
+            return result
+        result, entities = self.ha_service.build_exposed_entities_csv(area_id, domain, name, limit)
+        # The generation covers names, areas and exposure, the states of the rows are checked on every hit
+        states = tuple((entity["entity_id"], entity["state"]) for entity in entities)
+        self.cache.put("get_all_exposed_entities", key, result, lambda: self.ha_service.states_unchanged(states))
+        return result
+
+    async def search_exposed_entities(self, query, limit=None):
+        generation = self.ha_service.get_exposed_entities_generation()
+        if generation is None:
+            return self.ha_service.search_exposed_entities(query, limit)
+
+        key = (query, limit, generation)
+        if (result := self.cache.get("search_exposed_entities", key)) is MISSING:
+            result = self.ha_service.search_exposed_entities(query, limit)
+            self.cache.put("search_exposed_entities", key, result)
+        return result
+
+    async def get_available_services(self, domain):
+        key = (domain.lower(), self.ha_service.services_generation)
+        if (result := self.cache.get("get_domains_services", key)) is MISSING:
+            result = await self.ha_service.get_available_services(domain)
+            self.cache.put("get_domains_services", key, result)
+        return result
+
     def build_service_call_tool(self):
         service_tool = StructuredTool.from_function(
             coroutine=self.ha_service.call_service,
@@ -66,9 +128,23 @@ class HAServiceCallToolkit(object):
         )
         return service_tool
 
+    def build_service_call_batch_tool(self):
+        async def call_services(calls: list[HAServiceCallInput]):
+            return await self.ha_service.call_services([call.dict() for call in calls])
+
+        service_batch_tool = StructuredTool.from_function(
+            coroutine=call_services,
+            name="call_homeassistant_services",
+            description="use this tool instead of call_homeassistant_service when several services need to be called for one request, like turning off all devices at night, all calls are checked before any of them is made and the result of each call is returned",
+            args_schema=HAServiceCallBatchInput,
+            return_direct=False,
+            handle_tool_error=True,
+        )
+        return service_batch_tool
+
     def build_get_available_services_tool(self):
         available_services_tool = StructuredTool.from_function(
-            coroutine=self.ha_service.get_available_services,
+            coroutine=self.get_available_services,
             name="get_domains_services",
             description="use this tool to get all available services of the given domain, when you're not sure what services a domain has or which service should be used",
             args_schema=HAGetAvailableServicesInput,
@@ -78,14 +154,24 @@ class HAServiceCallToolkit(object):
 
     def build_get_exposed_entities_tool(self):
         exposed_entities_tool = StructuredTool.from_function(
-            func=self.ha_service.get_exposed_entities_csv,
+            coroutine=self.get_exposed_entities_csv,
             name="get_all_exposed_entities",
-            description="use this tool to get all exposed entities, this tool should be called before you want to call a service of an entity, the data is csv format",
+            description="use this tool to get all exposed entities, this tool should be called before you want to call a service of an entity, the data is csv format, rows are grouped under '# area: ..., domain: ...' lines, aliases are separated by '/'",
             args_schema=HAGetExposedEntitiesInput,
             return_direct=False
         )
         return exposed_entities_tool
 
+    def build_search_exposed_entities_tool(self):
+        search_entities_tool = StructuredTool.from_function(
+            coroutine=self.search_exposed_entities,
+            name="search_exposed_entities",
+            description="use this tool to find the entity_id of a device or entity by its name, alias or area, it returns the best candidates with a score from 0 to 1, prefer it over get_all_exposed_entities when you know what you are looking for",
+            args_schema=HASearchExposedEntitiesInput,
+            return_direct=False
+        )
+        return search_entities_tool
+
     def build_add_automation_tool(self):
         automation_tool = StructuredTool.from_function(
             coroutine=self.ha_service.add_automation,
@@ -119,3 +205,20 @@ class HAServiceCallToolkit(object):
         )
         return add_script_tool
 
+    def build_add_items_tool(self):
+        async def add_items(automations=None, scripts=None, scenes=None):
+            return await self.ha_service.add_items(
+                automations=automations,
+                scripts=scripts,
+                scenes=[scene.dict() for scene in scenes] if scenes else None,
+            )
+
+        add_items_tool = StructuredTool.from_function(
+            coroutine=add_items,
+            name="add_homeassistant_items",
+            description="use this tool instead of the other add tools when several related automations/scripts/scenes should be created for one request, either all of them are added or none, you need to get the exact value of entity_id/area_id/device_id instead of guessing",
+            args_schema=HAAddItemsInput,
+            return_direct=False,
+            handle_tool_error=True,
+        )
+        return add_items_tool
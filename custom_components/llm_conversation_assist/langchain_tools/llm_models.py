@@ -1,3 +1,20 @@
+from ..const import MODEL_OPENAI, MODEL_QIANFAN, MODEL_TONGYI
+
+
+def load_llm_class(model_type: str):
+    """Import the LLM class of the selected provider only, its sdk import is slow and blocking."""
+    if model_type == MODEL_TONGYI:
+        from langchain_community.llms import Tongyi
+        return Tongyi
+    if model_type == MODEL_OPENAI:
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI
+    if model_type == MODEL_QIANFAN:
+        from langchain_community.chat_models import QianfanChatEndpoint
+        return QianfanChatEndpoint
+    return None
+
+
 async def validate_tongyi_auth(
     api_key: str,
     model_name: str,
@@ -0,0 +1,64 @@
+import logging
+from typing import Any
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.schema.messages import BaseMessage
+
+from ..token_counter import estimate_tokens, truncate_to_tokens
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def count_message_tokens(messages: list[BaseMessage]) -> int:
+    return sum(estimate_tokens(message.content) for message in messages if isinstance(message.content, str))
+
+
+class ConversationTokenBudgetMemory(BaseChatMemory):
+    """Chat history trimmed to a token budget, measured with a local estimate.
+
+    Only the user inputs and final answers are saved. Oversized messages, oldest first, are
+    truncated before anything is dropped, then the oldest messages are dropped until the history fits.
+    """
+
+    memory_key: str = "chat_history"
+    max_token_limit: int = 1000
+    # No single message may take more than this share of the budget
+    max_message_share: float = 0.5
+
+    @property
+    def memory_variables(self) -> list[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: dict[str, Any]) -> dict[str, Any]:
+        return {self.memory_key: self.chat_memory.messages}
+
+    def save_context(self, inputs: dict[str, Any], outputs: dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self.prune()
+
+    def prune(self) -> None:
+        messages = self.chat_memory.messages
+        total = count_message_tokens(messages)
+        if total <= self.max_token_limit:
+            _LOGGER.debug("Chat history: %s tokens in %s messages, budget %s",
+                          total, len(messages), self.max_token_limit)
+            return
+
+        max_message_tokens = max(int(self.max_token_limit * self.max_message_share), 1)
+        for message in messages:
+            if total <= self.max_token_limit:
+                break
+            if not isinstance(message.content, str):
+                continue
+            tokens = estimate_tokens(message.content)
+            if tokens > max_message_tokens:
+                message.content = truncate_to_tokens(message.content, max_message_tokens)
+                total -= tokens - estimate_tokens(message.content)
+
+        while messages and total > self.max_token_limit:
+            message = messages.pop(0)
+            if isinstance(message.content, str):
+                total -= estimate_tokens(message.content)
+
+        _LOGGER.debug("Chat history trimmed: %s tokens in %s messages, budget %s",
+                      total, len(messages), self.max_token_limit)
@@ -0,0 +1,127 @@
+import json
+import re
+from typing import Any, Callable, Optional
+
+from langchain.callbacks.base import AsyncCallbackHandler
+from langchain.schema.output import ChatGenerationChunk, GenerationChunk
+
+_SENTENCE_END_RE = re.compile(r"[.!?;。！？；\n]+\s*")
+# Beginning of the final answer json blob of the structured chat agent
+_FINAL_ANSWER_RE = re.compile(r'"action"\s*:\s*"Final Answer"\s*,\s*"action_input"\s*:\s*"')
+
+
+class SentenceBuffer:
+    """Collect text deltas and hand them out sentence by sentence."""
+
+    def __init__(self, on_sentence: Callable[[str], None]):
+        self.on_sentence = on_sentence
+        self._buffer = ""
+
+    def add(self, text: str) -> None:
+        self._buffer += text
+        last_end = 0
+        for match in _SENTENCE_END_RE.finditer(self._buffer):
+            last_end = match.end()
+        if last_end:
+            sentences, self._buffer = self._buffer[:last_end], self._buffer[last_end:]
+            self.on_sentence(sentences)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self.on_sentence(self._buffer)
+            self._buffer = ""
+
+
+class _JsonStringReader:
+    """Decode a json string value that arrives in pieces, starting after its opening quote."""
+
+    def __init__(self):
+        self.done = False
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            return ""
+        decoded = []
+        text = self._pending + text
+        self._pending = ""
+        index = 0
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                self.done = True
+                break
+            if char == "\\":
+                # Wait for the complete escape sequence
+                length = 6 if text[index + 1:index + 2] == "u" else 2
+                if index + length > len(text):
+                    self._pending = text[index:]
+                    break
+                try:
+                    decoded.append(json.loads(f'"{text[index:index + length]}"'))
+                except ValueError:
+                    pass
+                index += length
+                continue
+            decoded.append(char)
+            index += 1
+        return "".join(decoded)
+
+
+class FinalAnswerStreamHandler(AsyncCallbackHandler):
+    """Forward the tokens of the agent's final answer while the LLM generates it.
+
+    Tokens of generations that call a tool are not forwarded: with the openai tools agent
+    a generation is dropped once it carries tool calls, with the structured chat agent only
+    the action_input of a "Final Answer" blob is forwarded.
+    """
+
+    def __init__(self, structured: bool, on_sentence: Callable[[str], None]):
+        self.structured = structured
+        self.sentences = SentenceBuffer(on_sentence)
+        self.streamed = False
+        self._generation = ""
+        self._reader: Optional[_JsonStringReader] = None
+        self._tool_call = False
+
+    async def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+        self._generation = ""
+        self._reader = None
+        self._tool_call = False
+
+    async def on_chat_model_start(self, *args: Any, **kwargs: Any) -> None:
+        await self.on_llm_start()
+
+    async def on_llm_new_token(
+            self,
+            token: str,
+            *,
+            chunk: Optional[GenerationChunk | ChatGenerationChunk] = None,
+            **kwargs: Any,
+    ) -> None:
+        if self.structured:
+            self._on_structured_token(token)
+            return
+
+        if isinstance(chunk, ChatGenerationChunk) and chunk.message.additional_kwargs.get("tool_calls"):
+            self._tool_call = True
+        if token and not self._tool_call:
+            self._forward(token)
+
+    def _on_structured_token(self, token: str) -> None:
+        if self._reader is None:
+            self._generation += token
+            match = _FINAL_ANSWER_RE.search(self._generation)
+            if match is None:
+                return
+            self._reader = _JsonStringReader()
+            token = self._generation[match.end():]
+        if text := self._reader.feed(token):
+            self._forward(text)
+
+    def _forward(self, text: str) -> None:
+        self.streamed = True
+        self.sentences.add(text)
+
+    def flush(self) -> None:
+        self.sentences.flush()
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+MISSING = object()
+
+
+class ToolResultCache:
+    """Results of read-only tools by tool name, arguments and version of the data they were built from.
+
+    Keys include a generation counter, so results of older data are never found again and
+    simply age out of the LRU. An entry may also carry an is_valid check for changes the
+    generation does not cover, like the states shown in the result.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.stats: dict[str, dict[str, int]] = {}
+        self._entries: OrderedDict[tuple, tuple[Any, Optional[Callable[[], bool]]]] = OrderedDict()
+
+    def _tool_stats(self, tool: str) -> dict[str, int]:
+        return self.stats.setdefault(tool, {"hits": 0, "misses": 0})
+
+    def get(self, tool: str, key: tuple) -> Any:
+        """The cached result or MISSING."""
+        stats = self._tool_stats(tool)
+        entry_key = (tool, *key)
+        entry = self._entries.get(entry_key)
+        if entry is not None:
+            result, is_valid = entry
+            if is_valid is None or is_valid():
+                self._entries.move_to_end(entry_key)
+                stats["hits"] += 1
+                return result
+            del self._entries[entry_key]
+        stats["misses"] += 1
+        return MISSING
+
+    def put(self, tool: str, key: tuple, result: Any, is_valid: Optional[Callable[[], bool]] = None) -> None:
+        entry_key = (tool, *key)
+        self._entries[entry_key] = (result, is_valid)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,257 @@
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable
+from uuid import UUID
+
+from langchain.callbacks.base import AsyncCallbackHandler
+from langchain.schema.messages import BaseMessage
+from langchain.schema.output import ChatGeneration, Generation, LLMResult
+
+from ..const import (
+    TRACE_BUFFER_SIZE,
+    TRACE_SAMPLE_INTERVAL,
+    TRACING_MODE_FULL,
+    TRACING_MODE_OFF,
+    TRACING_MODE_SAMPLED,
+)
+from ..metrics import Metrics
+from ..token_counter import estimate_tokens
+from .ha_tools import READ_ONLY_TOOLS
+from .memory import count_message_tokens
+
+# Tool the AgentExecutor runs to feed an output parsing error back to the LLM
+PARSE_ERROR_TOOL = "_Exception"
+
+_ENTITY_ID_RE = re.compile(r"\b[a-z0-9_]+\.[a-z0-9_]+\b")
+
+
+def _format(value: Any) -> Any:
+    if isinstance(value, BaseMessage):
+        message = {"type": value.type, "content": value.content}
+        if value.additional_kwargs:
+            message["additional_kwargs"] = value.additional_kwargs
+        return message
+    if isinstance(value, ChatGeneration):
+        return _format(value.message)
+    if isinstance(value, Generation):
+        return value.text
+    if isinstance(value, (list, tuple)):
+        return [_format(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _format(item) for key, item in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # e.g. the Service objects of a tool output, the diagnostics are JSON encoded
+    return str(value)
+
+
+class TurnTrace:
+    """Structured events of one turn.
+
+    Payloads are kept as the objects the agent already has (messages, generations, the rendered
+    prompt) and only formatted when the diagnostics are downloaded. Only a full trace keeps
+    contents, a sampled one keeps names, sizes and timings.
+    """
+
+    def __init__(self, full: bool, conversation_id: str, text: str):
+        self.full = full
+        self.conversation_id = conversation_id
+        self.text = text if full else None
+        self.started = time.time()
+        self._start = time.perf_counter()
+        # seconds since the start, event, payload
+        self.events: list[tuple[float, str, dict[str, Any]]] = []
+
+    def add(self, event: str, **data: Any) -> None:
+        self.events.append((time.perf_counter() - self._start, event, data))
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "mode": TRACING_MODE_FULL if self.full else TRACING_MODE_SAMPLED,
+            "conversation_id": self.conversation_id,
+            "text": self.text,
+            "events": [
+                {"at_ms": round(offset * 1e3, 1), "event": event, **_format(data)}
+                for offset, event, data in self.events
+            ],
+        }
+
+
+class TraceBuffer:
+    """The last TRACE_BUFFER_SIZE traced turns."""
+
+    def __init__(self):
+        self._traces: deque[TurnTrace] = deque(maxlen=TRACE_BUFFER_SIZE)
+        self._turns = 0
+
+    def start_turn(self, mode: str, conversation_id: str, text: str) -> TurnTrace | None:
+        """The trace to record the turn into, None if the turn is not traced."""
+        if mode == TRACING_MODE_OFF:
+            return None
+        self._turns += 1
+        if mode == TRACING_MODE_SAMPLED and (self._turns - 1) % TRACE_SAMPLE_INTERVAL:
+            return None
+        trace = TurnTrace(mode == TRACING_MODE_FULL, conversation_id, text)
+        self._traces.append(trace)
+        return trace
+
+    def as_dict(self) -> list[dict[str, Any]]:
+        return [trace.as_dict() for trace in self._traces]
+
+
+class TurnTracer(AsyncCallbackHandler):
+    """Spans of one agent run: every llm call and tool run, token usage and iterations.
+
+    Durations go into the shared Metrics as they end, the per-turn values when finish is called.
+    Token usage is taken from the provider's response, estimated locally when it has none
+    (e.g. while streaming). Events are also added to the trace of the turn, if it is traced.
+    """
+
+    def __init__(self, metrics: Metrics, trace: TurnTrace | None = None):
+        self.metrics = metrics
+        self.trace = trace
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.parse_errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # run_id -> span name, start, estimated prompt tokens
+        self._runs: dict[UUID, tuple[str, float, int]] = {}
+
+    async def on_chat_model_start(
+            self, serialized: dict[str, Any], messages: list[list[BaseMessage]], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        tokens = sum(count_message_tokens(m) for m in messages)
+        self._runs[run_id] = ("llm", time.perf_counter(), tokens)
+        if self.trace is not None:
+            if self.trace.full:
+                self.trace.add("llm_start", estimated_tokens=tokens, messages=messages)
+            else:
+                self.trace.add("llm_start", estimated_tokens=tokens, messages=sum(len(m) for m in messages))
+
+    async def on_llm_start(
+            self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        tokens = sum(estimate_tokens(prompt) for prompt in prompts)
+        self._runs[run_id] = ("llm", time.perf_counter(), tokens)
+        if self.trace is not None:
+            if self.trace.full:
+                self.trace.add("llm_start", estimated_tokens=tokens, prompts=prompts)
+            else:
+                self.trace.add("llm_start", estimated_tokens=tokens)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        if (run := self._end(run_id)) is None:
+            return
+        self.llm_calls += 1
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens"):
+            prompt_tokens = usage["prompt_tokens"]
+            completion_tokens = usage.get("completion_tokens", 0)
+        else:
+            prompt_tokens = run[2]
+            completion_tokens = sum(
+                estimate_tokens(generation.text) for generations in response.generations for generation in generations
+            )
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        if self.trace is not None:
+            data = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                    "estimated": not usage.get("prompt_tokens")}
+            if self.trace.full:
+                data["generations"] = response.generations
+            self.trace.add("llm_end", **data)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._end(run_id) is not None:
+            self.llm_calls += 1
+            self.metrics.increment("llm_errors")
+            if self.trace is not None:
+                self.trace.add("llm_error", error=repr(error))
+
+    async def on_tool_start(
+            self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        name = serialized.get("name", "")
+        if name == PARSE_ERROR_TOOL:
+            self.parse_errors += 1
+            if self.trace is not None:
+                self.trace.add("parse_error", **({"output": input_str} if self.trace.full else {}))
+            return
+        self.tool_calls += 1
+        self._runs[run_id] = (f"tool:{name}", time.perf_counter(), 0)
+        if self.trace is not None:
+            if self.trace.full:
+                self.trace.add("tool_start", tool=name, input=input_str)
+            else:
+                self.trace.add("tool_start", tool=name, input_chars=len(input_str))
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._end(run_id) is not None and self.trace is not None:
+            if self.trace.full:
+                self.trace.add("tool_end", output=str(output))
+            else:
+                self.trace.add("tool_end", output_chars=len(str(output)))
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._end(run_id) is not None:
+            self.metrics.increment("tool_errors")
+            if self.trace is not None:
+                self.trace.add("tool_error", error=repr(error))
+
+    def _end(self, run_id: UUID) -> tuple[str, float, int] | None:
+        if (run := self._runs.pop(run_id, None)) is None:
+            return None
+        elapsed = time.perf_counter() - run[1]
+        self.metrics.record(run[0], elapsed)
+        if run[0] != "llm":
+            self.metrics.record("tool", elapsed)
+        return run
+
+    def finish(self) -> None:
+        """Record the values of the whole run."""
+        metrics = self.metrics
+        # Every agent iteration is one llm call
+        metrics.record_turn_value("llm_calls", self.llm_calls)
+        metrics.record_turn_value("tool_calls", self.tool_calls)
+        metrics.record_turn_value("prompt_tokens", self.prompt_tokens)
+        metrics.increment("llm_calls", self.llm_calls)
+        metrics.increment("tool_calls", self.tool_calls)
+        metrics.increment("parse_errors", self.parse_errors)
+        metrics.increment("prompt_tokens", self.prompt_tokens)
+        metrics.increment("completion_tokens", self.completion_tokens)
+
+
+class TouchedEntitiesRecorder(AsyncCallbackHandler):
+    """Entities an agent run has seen in tool outputs, and whether the run only read.
+
+    Entity ids are taken from the tool outputs as they were sent to the LLM, so results
+    served by the tool cache count the same as fresh ones.
+    """
+
+    def __init__(self, is_entity: Callable[[str], bool]):
+        self.is_entity = is_entity
+        self.entity_ids: set[str] = set()
+        self.read_only = True
+        self.failed = False
+
+    async def on_tool_start(self, serialized: dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        name = serialized.get("name", "")
+        if name == PARSE_ERROR_TOOL:
+            self.failed = True
+        elif name not in READ_ONLY_TOOLS:
+            self.read_only = False
+
+    async def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self.entity_ids.update(
+            entity_id for entity_id in _ENTITY_ID_RE.findall(str(output)) if self.is_entity(entity_id)
+        )
+
+    async def on_tool_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.failed = True
+
+    async def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.failed = True
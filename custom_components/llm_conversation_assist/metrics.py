@@ -0,0 +1,135 @@
+"""Span durations and counters of the agent turns, for diagnostics and the metric sensors."""
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from collections import deque
+from typing import Any, Callable
+
+# Recent samples kept per histogram
+METRICS_WINDOW = 500
+# Upper bounds in seconds of the histogram buckets
+_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class RollingHistogram:
+    """The last METRICS_WINDOW samples, with a running count and total of all samples."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last: float | None = None
+        self._samples: deque[float] = deque(maxlen=METRICS_WINDOW)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+        self._samples.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, max(0, round(q * len(samples)) - 1))]
+
+    def mean(self) -> float | None:
+        if not self._samples:
+            return None
+        return sum(self._samples) / len(self._samples)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "last": self.last,
+            "mean": self.mean(),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": max(self._samples, default=None),
+        }
+
+    def buckets(self) -> dict[str, int]:
+        """Samples of the window per bucket, keyed by the bucket's upper bound."""
+        counts = dict.fromkeys([f"<={bound}s" for bound in _BUCKETS] + ["inf"], 0)
+        for value in self._samples:
+            for bound in _BUCKETS:
+                if value <= bound:
+                    counts[f"<={bound}s"] += 1
+                    break
+            else:
+                counts["inf"] += 1
+        return counts
+
+
+class Metrics:
+    """Rolling histograms of span durations in seconds, per-turn values and counters."""
+
+    def __init__(self):
+        # span name -> durations, e.g. "turn", "system_prompt", "llm", "tool:<name>", "ha:<method>"
+        self.spans: dict[str, RollingHistogram] = {}
+        # value name -> one value per turn, e.g. "llm_calls"
+        self.per_turn: dict[str, RollingHistogram] = {}
+        self.counters: dict[str, int] = {}
+        self._listeners: list[Callable[[], None]] = []
+
+    def record(self, span: str, seconds: float) -> None:
+        if (histogram := self.spans.get(span)) is None:
+            histogram = self.spans[span] = RollingHistogram()
+        histogram.add(seconds)
+
+    def record_turn_value(self, name: str, value: float) -> None:
+        if (histogram := self.per_turn.get(name)) is None:
+            histogram = self.per_turn[name] = RollingHistogram()
+        histogram.add(value)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Called after every turn."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def notify(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "spans": {
+                span: {**histogram.summary(), "buckets": histogram.buckets()}
+                for span, histogram in sorted(self.spans.items())
+            },
+            "per_turn": {name: histogram.summary() for name, histogram in sorted(self.per_turn.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+def timed(span: str):
+    """Record the duration of a method into self.metrics."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(self, *args, **kwargs)
+                finally:
+                    self.metrics.record(span, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self.metrics.record(span, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
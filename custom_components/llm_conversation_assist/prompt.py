@@ -0,0 +1,28 @@
+"""Helpers to render the prompt templates."""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Callable
+
+import jinja2
+from jinja2 import nodes
+
+
+@lru_cache(maxsize=16)
+def get_template_variables(source: str) -> frozenset[str] | None:
+    """Names referenced by a template, None if it can't be parsed (rendering will report the error)."""
+    try:
+        ast = jinja2.Environment().parse(source)
+    except jinja2.TemplateSyntaxError:
+        return None
+    return frozenset(node.name for node in ast.find_all(nodes.Name))
+
+
+def build_render_context(source: str, factories: dict[str, Callable[[], Any]]) -> dict[str, Any]:
+    """Only compute the variables the template actually references."""
+    variables = get_template_variables(source)
+    return {
+        name: factory()
+        for name, factory in factories.items()
+        if variables is None or name in variables
+    }
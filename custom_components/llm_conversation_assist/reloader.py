@@ -0,0 +1,99 @@
+"""Reloads of the automation, script and scene configs after the agent changed them."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+import voluptuous as vol
+
+from homeassistant.const import SERVICE_RELOAD
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+# Mutations within this delay are covered by one reload of their domain
+RELOAD_DELAY = 5
+
+
+class ConfigReloader:
+    """Coalesce the reloads of several mutations into one reload per domain.
+
+    A scheduled reload runs after RELOAD_DELAY, or earlier when flushed, which happens before
+    a service is called (it may target the new item) and at the end of every agent run.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self.stats: dict[str, dict[str, Any]] = {}
+        self._pending: set[str] = set()
+        self._unsub_timer: Callable[[], None] | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    def _domain_stats(self, domain: str) -> dict[str, Any]:
+        return self.stats.setdefault(domain, {
+            "mutations": 0,
+            "reloads": 0,
+            "targeted_reloads": 0,
+            "last_reload_seconds": None,
+            "total_reload_seconds": 0.0,
+        })
+
+    @callback
+    def async_schedule(self, domain: str) -> None:
+        """Reload the domain soon, together with the other mutations of the same run."""
+        self._domain_stats(domain)["mutations"] += 1
+        self._pending.add(domain)
+        if self._unsub_timer is None:
+            self._unsub_timer = async_call_later(self.hass, RELOAD_DELAY, self._async_timer_fired)
+
+    async def _async_timer_fired(self, _now: datetime) -> None:
+        self._unsub_timer = None
+        await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Run the scheduled reloads now."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        domains, self._pending = self._pending, set()
+        for domain in sorted(domains):
+            await self._async_reload(domain)
+
+    @callback
+    def async_cancel(self) -> None:
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    async def async_reload_item(self, domain: str, service_data: dict[str, Any]) -> None:
+        """Reload a single item, falls back to reloading the domain when that's not supported."""
+        self._domain_stats(domain)["mutations"] += 1
+        try:
+            await self._async_reload(domain, service_data)
+        except vol.Invalid:
+            _LOGGER.debug("Targeted %s reload not supported, reloading all", domain)
+            await self._async_reload(domain)
+
+    async def _async_reload(self, domain: str, service_data: dict[str, Any] | None = None) -> None:
+        stats = self._domain_stats(domain)
+        async with self._lock:
+            start = time.perf_counter()
+            try:
+                await self.hass.services.async_call(domain, SERVICE_RELOAD, service_data, blocking=True)
+            except HomeAssistantError as err:
+                _LOGGER.error("Reloading %s failed: %s", domain, err)
+                return
+            elapsed = time.perf_counter() - start
+        stats["targeted_reloads" if service_data else "reloads"] += 1
+        stats["last_reload_seconds"] = round(elapsed, 3)
+        stats["total_reload_seconds"] = round(stats["total_reload_seconds"] + elapsed, 3)
+        _LOGGER.debug("Reloaded %s %s in %.3fs", domain, service_data or "", elapsed)
@@ -0,0 +1,289 @@
+"""Optional semantic retrieval of exposed entities and scripts, with a local hashing embedding.
+
+Imported lazily, numpy is not a requirement of the integration.
+"""
+from __future__ import annotations
+
+import base64
+import logging
+import zlib
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+from homeassistant.components.script import DOMAIN as SCRIPT_DOMAIN
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.storage import Store
+
+from .const import RETRIEVAL_STORAGE_KEY, RETRIEVAL_STORAGE_VERSION
+from .entity_resolver import text_grams
+from .intent_matcher import normalize
+
+if TYPE_CHECKING:
+    from .ha_service import HaService
+
+_LOGGER = logging.getLogger(__name__)
+
+# Stored vectors are only reused when they were made by the same embedding
+EMBEDDING_MODEL = "hashing-v1"
+EMBEDDING_DIM = 256
+# Items below this cosine similarity are not worth a line in the prompt
+_MIN_SCORE = 0.1
+# Embedding more texts than this is done in the executor
+_INLINE_EMBED_LIMIT = 20
+_SAVE_DELAY = 30
+_SCRIPT_REFRESH_COOLDOWN = 2
+
+
+def embed(text: str) -> np.ndarray:
+    """Signed feature hashing of the words and n-grams of the text, unit length.
+
+    crc32 is used instead of hash(), which is salted per process, so vectors stay valid across restarts.
+    """
+    features = [*normalize(text).split(), *text_grams(text)]
+    if not features:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes >> 31, -1.0, 1.0)
+    vector = np.bincount(hashes % EMBEDDING_DIM, weights=signs, minlength=EMBEDDING_DIM).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _embed_all(texts: dict[str, str]) -> dict[str, np.ndarray]:
+    return {item_id: embed(text) for item_id, text in texts.items()}
+
+
+def _text_hash(text: str) -> int:
+    return zlib.crc32(text.encode())
+
+
+def entity_text(entity: dict[str, Any]) -> str:
+    parts = [entity["name"], *entity["aliases"]]
+    if entity["area_id"]:
+        parts += [entity["area_name"], *entity["area_aliases"]]
+    parts.append(entity["domain"])
+    return " ".join(part for part in parts if part)
+
+
+def script_text(script_id: str, script: dict[str, Any]) -> str:
+    parts = [script_id.replace("_", " "), script.get("alias"), script.get("description")]
+    return " ".join(str(part) for part in parts if part)
+
+
+class _VectorTable:
+    """Unit vectors of one kind of item, rows of a numpy matrix that grows on demand."""
+
+    def __init__(self):
+        self.ids: list[str] = []
+        self.hashes: dict[str, int] = {}
+        self._rows: dict[str, int] = {}
+        self._matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def set(self, item_id: str, text_hash: int, vector: np.ndarray) -> None:
+        if (row := self._rows.get(item_id)) is None:
+            row = len(self.ids)
+            if row == len(self._matrix):
+                grown = np.zeros((max(16, row * 2), EMBEDDING_DIM), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self.ids.append(item_id)
+            self._rows[item_id] = row
+        self._matrix[row] = vector
+        self.hashes[item_id] = text_hash
+
+    def remove(self, item_id: str) -> None:
+        if (row := self._rows.pop(item_id, None)) is None:
+            return
+        del self.hashes[item_id]
+        # Move the last row into the gap
+        last_id = self.ids.pop()
+        if last_id != item_id:
+            self._matrix[row] = self._matrix[len(self.ids)]
+            self.ids[row] = last_id
+            self._rows[last_id] = row
+
+    def top_k(self, query: np.ndarray, limit: int) -> list[tuple[str, float]]:
+        count = len(self.ids)
+        if not count or limit <= 0:
+            return []
+        scores = self._matrix[:count] @ query
+        if limit < count:
+            rows = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            rows = np.arange(count)
+        rows = rows[np.argsort(-scores[rows])]
+        return [(self.ids[row], float(scores[row])) for row in rows if scores[row] >= _MIN_SCORE]
+
+    def dump(self) -> dict[str, Any]:
+        # float16 halves the size of the storage file, plenty for ranking
+        vectors = self._matrix[:len(self.ids)].astype(np.float16)
+        return {
+            "ids": list(self.ids),
+            "hashes": [self.hashes[item_id] for item_id in self.ids],
+            "vectors": base64.b64encode(vectors.tobytes()).decode(),
+        }
+
+    @classmethod
+    def load(cls, data: dict[str, Any]) -> _VectorTable:
+        table = cls()
+        vectors = np.frombuffer(base64.b64decode(data["vectors"]), dtype=np.float16)
+        vectors = vectors.reshape(-1, EMBEDDING_DIM).astype(np.float32)
+        if len(vectors) != len(data["ids"]):
+            raise ValueError("Stored vectors don't match their ids")
+        for item_id, text_hash, vector in zip(data["ids"], data["hashes"], vectors):
+            table.set(item_id, text_hash, vector)
+        return table
+
+
+class SemanticRetrieval:
+    """Top-k exposed entities and scripts for an utterance, for the system prompt.
+
+    Every item is embedded once, vectors are persisted to .storage and only re-embedded when
+    the text they were made from changes.
+    """
+
+    def __init__(self, hass: HomeAssistant, ha_service: HaService, entry_id: str):
+        self.hass = hass
+        self.ha_service = ha_service
+        self.ready = False
+        self._store = Store(hass, RETRIEVAL_STORAGE_VERSION, RETRIEVAL_STORAGE_KEY.format(entry_id=entry_id))
+        self._entities = _VectorTable()
+        self._scripts = _VectorTable()
+        # script_id -> item for the relevant_scripts prompt variable
+        self._script_items: dict[str, dict[str, Any]] = {}
+        self._unsub: list[Callable[[], None]] = []
+        self._script_debouncer = Debouncer(
+            hass, _LOGGER, cooldown=_SCRIPT_REFRESH_COOLDOWN, immediate=False, function=self._async_refresh_scripts
+        )
+
+    async def async_setup(self) -> None:
+        await self._async_load()
+        self._unsub = [
+            self.ha_service.entity_index.async_add_listener(self._async_entity_changed),
+            self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed),
+        ]
+        await self._async_sync(self._entities, self._entity_texts)
+        await self._async_refresh_scripts()
+        self.ready = True
+        _LOGGER.debug("Semantic retrieval: %s entities, %s scripts", len(self._entities), len(self._scripts))
+
+    async def async_unload(self) -> None:
+        for unsub in self._unsub:
+            unsub()
+        self._unsub = []
+        self._script_debouncer.async_cancel()
+        self.ready = False
+        await self._store.async_save(self._data_to_save())
+
+    async def _async_load(self) -> None:
+        if (data := await self._store.async_load()) is None:
+            return
+        if data.get("model") != EMBEDDING_MODEL or data.get("dim") != EMBEDDING_DIM:
+            _LOGGER.debug("Stored vectors were made by another embedding, re-embedding")
+            return
+        try:
+            self._entities, self._scripts = await self.hass.async_add_executor_job(
+                lambda: (_VectorTable.load(data["entities"]), _VectorTable.load(data["scripts"]))
+            )
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring invalid stored vectors: %s", err)
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        return {
+            "model": EMBEDDING_MODEL,
+            "dim": EMBEDDING_DIM,
+            "entities": self._entities.dump(),
+            "scripts": self._scripts.dump(),
+        }
+
+    @callback
+    def _entity_texts(self) -> dict[str, str]:
+        return {
+            entity["entity_id"]: entity_text(entity)
+            for entity in self.ha_service.get_all_exposed_entities()
+        }
+
+    async def _async_sync(self, table: _VectorTable, get_texts: Callable[[], dict[str, str]]) -> None:
+        """Embed new and changed items, drop the ones that are gone."""
+        changed = {
+            item_id: text for item_id, text in get_texts().items()
+            if table.hashes.get(item_id) != _text_hash(text)
+        }
+        if len(changed) > _INLINE_EMBED_LIMIT:
+            vectors = await self.hass.async_add_executor_job(_embed_all, changed)
+        else:
+            vectors = _embed_all(changed)
+
+        # Items may have changed again while embedding, read the texts anew
+        texts = get_texts()
+        for item_id, text in texts.items():
+            text_hash = _text_hash(text)
+            if table.hashes.get(item_id) == text_hash:
+                continue
+            vector = vectors[item_id] if changed.get(item_id) == text else embed(text)
+            table.set(item_id, text_hash, vector)
+        for item_id in [item_id for item_id in table.ids if item_id not in texts]:
+            table.remove(item_id)
+        if changed or len(table) != len(texts):
+            self._store.async_delay_save(self._data_to_save, _SAVE_DELAY)
+
+    @callback
+    def _async_entity_changed(self, entity_id: str | None) -> None:
+        if entity_id is None:
+            self.hass.async_create_task(self._async_sync(self._entities, self._entity_texts))
+            return
+        if (entity := self.ha_service.entity_index.get(entity_id)) is None:
+            self._entities.remove(entity_id)
+        else:
+            text = entity_text(entity)
+            if self._entities.hashes.get(entity_id) == (text_hash := _text_hash(text)):
+                return
+            self._entities.set(entity_id, text_hash, embed(text))
+        self._store.async_delay_save(self._data_to_save, _SAVE_DELAY)
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Script entities are added, removed or renamed when scripts.yaml is reloaded."""
+        entity_id: str = event.data["entity_id"]
+        if not entity_id.startswith(f"{SCRIPT_DOMAIN}."):
+            return
+        old_state, new_state = event.data["old_state"], event.data["new_state"]
+        if old_state is None or new_state is None or old_state.name != new_state.name:
+            self.hass.async_create_task(self._script_debouncer.async_call())
+
+    async def _async_refresh_scripts(self) -> None:
+        scripts = await self.ha_service.read_current_script()
+        self._script_items = {
+            script_id: {
+                "script_id": script_id,
+                "alias": script.get("alias", ""),
+                "description": script.get("description", ""),
+            }
+            for script_id, script in scripts.items()
+            if isinstance(script, dict)
+        }
+        texts = {script_id: script_text(script_id, scripts[script_id]) for script_id in self._script_items}
+        await self._async_sync(self._scripts, lambda: texts)
+
+    @callback
+    def search(self, text: str, limit: int) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """The exposed entities and the scripts most related to the text, best first."""
+        if not self.ready:
+            return [], []
+        query = embed(text)
+        entities = [
+            entity for entity_id, _ in self._entities.top_k(query, limit)
+            if (entity := self.ha_service.entity_index.get(entity_id)) is not None
+        ]
+        scripts = [
+            self._script_items[script_id] for script_id, _ in self._scripts.top_k(query, limit)
+            if script_id in self._script_items
+        ]
+        return entities, scripts
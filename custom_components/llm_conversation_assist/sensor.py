@@ -0,0 +1,121 @@
+"""Diagnostic sensors of the agent turn metrics, disabled by default."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .const import DOMAIN
+from .metrics import Metrics
+
+
+def _span_ms(span: str, q: float | None = None) -> Callable[[Metrics], float | None]:
+    """Last duration of a span, or a percentile of its window, in milliseconds."""
+
+    def value(metrics: Metrics) -> float | None:
+        if (histogram := metrics.spans.get(span)) is None:
+            return None
+        seconds = histogram.last if q is None else histogram.percentile(q)
+        return None if seconds is None else round(seconds * 1e3, 1)
+
+    return value
+
+
+def _turn_mean(name: str) -> Callable[[Metrics], float | None]:
+    def value(metrics: Metrics) -> float | None:
+        if (histogram := metrics.per_turn.get(name)) is None or (mean := histogram.mean()) is None:
+            return None
+        return round(mean, 2)
+
+    return value
+
+
+@dataclass(frozen=True, kw_only=True)
+class MetricSensorEntityDescription(SensorEntityDescription):
+    value_fn: Callable[[Metrics], float | int | None]
+
+
+SENSORS: tuple[MetricSensorEntityDescription, ...] = (
+    MetricSensorEntityDescription(
+        key="last_turn_duration",
+        translation_key="last_turn_duration",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_span_ms("turn"),
+    ),
+    MetricSensorEntityDescription(
+        key="turn_duration_p95",
+        translation_key="turn_duration_p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_span_ms("turn", 0.95),
+    ),
+    MetricSensorEntityDescription(
+        key="llm_duration_p95",
+        translation_key="llm_duration_p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_span_ms("llm", 0.95),
+    ),
+    MetricSensorEntityDescription(
+        key="tool_duration_p95",
+        translation_key="tool_duration_p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_span_ms("tool", 0.95),
+    ),
+    MetricSensorEntityDescription(
+        key="llm_calls_per_turn",
+        translation_key="llm_calls_per_turn",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=_turn_mean("llm_calls"),
+    ),
+    MetricSensorEntityDescription(
+        key="prompt_tokens",
+        translation_key="prompt_tokens",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.counters.get("prompt_tokens", 0),
+    ),
+)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    metrics = hass.data[DOMAIN][entry.entry_id].metrics
+    async_add_entities(MetricSensor(entry, metrics, description) for description in SENSORS)
+
+
+class MetricSensor(SensorEntity):
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    entity_description: MetricSensorEntityDescription
+
+    def __init__(self, entry: ConfigEntry, metrics: Metrics, description: MetricSensorEntityDescription) -> None:
+        self.entity_description = description
+        self.metrics = metrics
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name=entry.title,
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    @property
+    def native_value(self) -> float | int | None:
+        return self.entity_description.value_fn(self.metrics)
+
+    async def async_added_to_hass(self) -> None:
+        # Updated after every turn, not polled
+        self.async_on_remove(self.metrics.add_listener(self.async_write_ha_state))
@@ -0,0 +1,121 @@
+"""Validation of the entity, area and device ids the LLM passes to services."""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable
+
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import (
+    area_registry as ar,
+    device_registry as dr,
+    entity_registry as er,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+TARGET_KEYS = ("entity_id", "area_id", "device_id")
+
+
+def as_id_list(value: Any) -> list:
+    """Service targets may be a single id or a list of ids."""
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+
+class TargetValidator:
+    """Sets of the registered entity, area and device ids, kept current by registry events.
+
+    Exposure is answered by is_exposed, which reads the exposed entity index.
+    """
+
+    def __init__(self, hass: HomeAssistant, is_exposed: Callable[[str], bool]):
+        self.hass = hass
+        self.is_exposed = is_exposed
+        self.ready = False
+        self._entity_ids: set[str] = set()
+        self._area_ids: set[str] = set()
+        self._device_ids: set[str] = set()
+        self._unsub: list[Callable[[], None]] = []
+
+    @callback
+    def async_setup(self) -> None:
+        if self.ready:
+            return
+        self._unsub = [
+            self.hass.bus.async_listen(er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated),
+            self.hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated),
+            self.hass.bus.async_listen(ar.EVENT_AREA_REGISTRY_UPDATED, self._async_area_registry_updated),
+        ]
+        self._fill()
+        self.ready = True
+
+    @callback
+    def async_unload(self) -> None:
+        for unsub in self._unsub:
+            unsub()
+        self._unsub = []
+        self.ready = False
+
+    def _fill(self) -> None:
+        self._entity_ids = set(er.async_get(self.hass).entities)
+        self._area_ids = {area.id for area in ar.async_get(self.hass).async_list_areas()}
+        self._device_ids = set(dr.async_get(self.hass).devices)
+        _LOGGER.debug("Target validator: %s entities, %s areas, %s devices",
+                      len(self._entity_ids), len(self._area_ids), len(self._device_ids))
+
+    @callback
+    def _async_entity_registry_updated(self, event: Event) -> None:
+        action = event.data["action"]
+        if action == "remove":
+            self._entity_ids.discard(event.data["entity_id"])
+            return
+        if (old_entity_id := event.data.get("old_entity_id")) is not None:
+            self._entity_ids.discard(old_entity_id)
+        self._entity_ids.add(event.data["entity_id"])
+
+    @callback
+    def _async_device_registry_updated(self, event: Event) -> None:
+        if event.data["action"] == "remove":
+            self._device_ids.discard(event.data["device_id"])
+        else:
+            self._device_ids.add(event.data["device_id"])
+
+    @callback
+    def _async_area_registry_updated(self, event: Event) -> None:
+        if event.data["action"] == "remove":
+            self._area_ids.discard(event.data["area_id"])
+        else:
+            self._area_ids.add(event.data["area_id"])
+
+    @callback
+    def validate(self, targets: dict[str, Any]) -> list[str]:
+        """Every problem with the entity_id, area_id and device_id in targets, empty when all are valid."""
+        if not self.ready:
+            # Not following the registries, check against a fresh copy
+            self._fill()
+
+        errors = []
+        if "entity_id" in targets:
+            unknown = []
+            unexposed = []
+            for entity_id in as_id_list(targets["entity_id"]):
+                if not isinstance(entity_id, str) or entity_id not in self._entity_ids:
+                    unknown.append(str(entity_id))
+                elif not self.is_exposed(entity_id):
+                    unexposed.append(entity_id)
+            if unknown:
+                errors.append(f"Unknown entity_id: {', '.join(unknown)}, you should reacquire exposed entities, entity_id should be of string type and the format should conform to domain.unique_id, like lgiht.123")
+            if unexposed:
+                errors.append(f"Unexposed entity {', '.join(unexposed)}")
+
+        for key, known in (("area_id", self._area_ids), ("device_id", self._device_ids)):
+            if key not in targets:
+                continue
+            unknown = [
+                str(target_id) for target_id in as_id_list(targets[key])
+                if not isinstance(target_id, str) or target_id not in known
+            ]
+            if unknown:
+                errors.append(f"Unknown {key}: {', '.join(unknown)}, you should reacquire exposed entities")
+        return errors
@@ -0,0 +1,33 @@
+"""Local token estimate, close enough to size prompts without a provider tokenizer."""
+from __future__ import annotations
+
+import re
+
+# CJK characters are about one token each, other text about four characters per token
+_CJK_RE = re.compile(r"[　-〿぀-ヿ㐀-䶿一-鿿가-힯＀-￯]")
+_CHARS_PER_TOKEN = 4
+
+TRUNCATED_MARK = " ...(truncated)"
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + -(-(len(text) - cjk) // _CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text so that its estimate fits in max_tokens, marking the cut."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRUNCATED_MARK)
+    # The estimate grows with the prefix length, search the longest prefix that fits
+    low, high = 0, min(len(text), max(budget, 0) * _CHARS_PER_TOKEN)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + TRUNCATED_MARK
@@ -0,0 +1,57 @@
+"""Cache of the parsed automation, script and scene config files."""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any
+
+from homeassistant.util.file import write_utf8_file_atomic
+from homeassistant.util.yaml import dump, load_yaml
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class YamlFileCache:
+    """Parsed YAML documents by path, valid as long as the file's mtime and size are unchanged.
+
+    Edits made elsewhere, like the UI editor, change the mtime and cause a re-parse. Writes go
+    through the cache, which keeps the written document instead of parsing it again.
+    Both methods do blocking I/O and run in the executor. The documents returned by read are
+    shared: they may only be modified by the writer of the file, followed by a write.
+    """
+
+    def __init__(self):
+        # path -> ((mtime_ns, size), document)
+        self._entries: dict[str, tuple[tuple[int, int], Any]] = {}
+
+    def read(self, path: str) -> Any:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        if (entry := self._entries.get(path)) is not None and entry[0] == key:
+            return entry[1]
+
+        _LOGGER.debug("Parsing %s", path)
+        data = load_yaml(path)
+        self._entries[path] = (key, data)
+        return data
+
+    def write(self, path: str, data: Any) -> None:
+        try:
+            # Do it before opening file. If dump causes error it will now not
+            # truncate the file.
+            contents = dump(data)
+            write_utf8_file_atomic(path, contents)
+        except Exception:
+            # data may be the cached document modified in place, never serve it unwritten
+            self.invalidate(path)
+            raise
+        stat = os.stat(path)
+        self._entries[path] = ((stat.st_mtime_ns, stat.st_size), data)
+
+    def invalidate(self, path: str) -> None:
+        """Parse the file again on the next read, e.g. after a document was modified but not written."""
+        self._entries.pop(path, None)
@@ -0,0 +1,8 @@
+"""The tests import the integration from the repository root, like Home Assistant does from its config dir.
+
+They need homeassistant and the integration requirements installed.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.core import State
+
+from custom_components.llm_conversation_assist import answer_cache
+from custom_components.llm_conversation_assist.answer_cache import AnswerCache
+
+START = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+GARAGE = "cover.garage_door"
+LIVING_ROOM = "sensor.living_room_temperature"
+
+
+class _Hass:
+    """Only the state machine lookups the cache does."""
+
+    def __init__(self):
+        self.states: dict[str, State] = {}
+
+    def set(self, entity_id: str, state: str, last_updated: datetime) -> None:
+        self.states[entity_id] = State(entity_id, state, last_updated=last_updated)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def hass():
+    hass = _Hass()
+    hass.set(GARAGE, "closed", START - timedelta(minutes=5))
+    hass.set(LIVING_ROOM, "21.5", START - timedelta(minutes=1))
+    return hass
+
+
+def test_hit_for_normalized_utterance(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    cache.put("en", "Is the garage door open?", "No, it is closed.", {GARAGE}, START, 1200)
+
+    assert cache.get("en", "is the  garage door open") == "No, it is closed."
+    assert cache.get("de", "is the garage door open") is None
+    assert cache.stats == {
+        "entries": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5, "invalidated": 0, "saved_tokens": 1200,
+    }
+
+
+def test_state_change_invalidates(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    cache.put("en", "is the garage door open", "No, it is closed.", {GARAGE, LIVING_ROOM}, START, 1200)
+
+    hass.set(LIVING_ROOM, "22.0", START + timedelta(minutes=1))
+    assert cache.get("en", "is the garage door open") is None
+    assert cache.stats["invalidated"] == 1
+    assert cache.stats["entries"] == 0
+
+
+def test_removed_entity_invalidates(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    cache.put("en", "is the garage door open", "No, it is closed.", {GARAGE}, START, 1200)
+
+    del hass.states[GARAGE]
+    assert cache.get("en", "is the garage door open") is None
+
+
+def test_expires_after_max_age(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    cache.put("en", "is the garage door open", "No, it is closed.", {GARAGE}, START, 1200)
+
+    clock[0] += 3599
+    assert cache.get("en", "is the garage door open") is not None
+    clock[0] += 2
+    assert cache.get("en", "is the garage door open") is None
+
+
+def test_not_stored_when_changed_during_the_turn(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    hass.set(GARAGE, "open", START + timedelta(seconds=2))
+    cache.put("en", "is the garage door open", "No, it is closed.", {GARAGE}, START, 1200)
+
+    assert cache.get("en", "is the garage door open") is None
+    assert cache.stats["entries"] == 0
+
+
+def test_not_stored_without_entities(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    cache.put("en", "tell me a joke", "...", set(), START, 500)
+    assert cache.stats["entries"] == 0
+
+
+def test_least_recently_used_is_evicted(hass, clock):
+    cache = AnswerCache(hass, 2, 3600)
+    cache.put("en", "first", "1", {GARAGE}, START, 1)
+    cache.put("en", "second", "2", {GARAGE}, START, 1)
+    assert cache.get("en", "first") == "1"
+    cache.put("en", "third", "3", {GARAGE}, START, 1)
+
+    assert cache.get("en", "second") is None
+    assert cache.get("en", "first") == "1"
+    assert cache.get("en", "third") == "3"
+
+
+def test_clear(hass, clock):
+    cache = AnswerCache(hass, 10, 3600)
+    cache.put("en", "is the garage door open", "No, it is closed.", {GARAGE}, START, 1200)
+    cache.clear()
+    assert cache.get("en", "is the garage door open") is None
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.llm_conversation_assist import conversation_store
+from custom_components.llm_conversation_assist.conversation_store import ConversationStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation_store.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_new_conversation_without_id():
+    store = ConversationStore(list, 10, 600)
+    first_id, first = store.get(None)
+    second_id, second = store.get(None)
+    assert first_id != second_id
+    assert first is not second
+
+
+def test_same_id_keeps_memory():
+    store = ConversationStore(list, 10, 600)
+    conversation_id, memory = store.get("satellite")
+    memory.append("hello")
+    assert store.get(conversation_id) == (conversation_id, ["hello"])
+    assert len(store) == 1
+
+
+def test_least_recently_used_is_evicted(clock):
+    store = ConversationStore(list, 2, 600)
+    _, first = store.get("first")
+    store.get("second")
+    # Using the first again makes the second the least recently used
+    assert store.get("first")[1] is first
+    store.get("third")
+
+    assert len(store) == 2
+    assert store.get("first")[1] is first
+    assert store.get("second")[1] == []
+    assert len(store) == 2
+
+
+def test_idle_conversation_is_evicted(clock):
+    store = ConversationStore(list, 10, 600)
+    _, idle = store.get("idle")
+    idle.append("old")
+    clock[0] += 300
+    _, active = store.get("active")
+    clock[0] += 400
+
+    # idle was last used 700s ago, active 400s ago
+    _, memory = store.get("active")
+    assert memory is active
+    assert len(store) == 1
+    assert store.get("idle")[1] == []
+
+
+def test_clear():
+    store = ConversationStore(list, 10, 600)
+    store.get("first")
+    store.clear()
+    assert len(store) == 0
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.llm_conversation_assist.intent_matcher import (
+    ACTION_ON,
+    FastPathMatch,
+    FastPathMatcher,
+)
+
+KITCHEN_LIGHT = "light.kitchen"
+KITCHEN_FAN = "fan.kitchen"
+
+
+class _HaService:
+    """Only the lookups and calls the fast path makes, every call is recorded."""
+
+    def __init__(self, invalid: set[str] = frozenset(), failing: set[str] = frozenset()):
+        self.invalid = invalid
+        self.failing = failing
+        self.called: list[tuple[str, str, list[str]]] = []
+
+    def get_exposed_entities_generation(self) -> int:
+        return 1
+
+    def get_all_exposed_entities(self) -> list[dict]:
+        return [
+            {"entity_id": entity_id, "domain": entity_id.split(".")[0], "name": name, "aliases": [],
+             "area_id": "kitchen", "area_name": "Kitchen", "area_aliases": []}
+            for entity_id, name in ((KITCHEN_LIGHT, "Kitchen light"), (KITCHEN_FAN, "Kitchen fan"))
+        ]
+
+    async def validate_service_calls(self, calls: list[dict]) -> list[str]:
+        return [
+            f"{index}. {call['domain']}.{call['service']}: Unknown service"
+            for index, call in enumerate(calls, 1) if call["domain"] in self.invalid
+        ]
+
+    async def call_service(self, domain: str, service: str, service_data: dict):
+        if domain in self.failing:
+            return "Device is unavailable"
+        self.called.append((domain, service, service_data["entity_id"]))
+        return True
+
+
+def _two_domains(matcher: FastPathMatcher) -> None:
+    """Both kitchen devices in one command, light first."""
+    result = FastPathMatch(action=ACTION_ON, verb="turn on")
+    result.calls = {"light": ("turn_on", [KITCHEN_LIGHT]), "fan": ("turn_on", [KITCHEN_FAN])}
+    result.names = {KITCHEN_LIGHT: "Kitchen light", KITCHEN_FAN: "Kitchen fan"}
+    matcher.match = lambda text: result
+
+
+def test_executes_a_matched_command():
+    ha_service = _HaService()
+    matcher = FastPathMatcher(ha_service)
+
+    assert asyncio.run(matcher.async_handle("Please turn on the kitchen light")) == "Turned on Kitchen light."
+    assert ha_service.called == [("light", "turn_on", [KITCHEN_LIGHT])]
+    assert matcher.hits == 1
+
+
+def test_unmatched_goes_to_the_llm():
+    matcher = FastPathMatcher(_HaService())
+
+    assert asyncio.run(matcher.async_handle("what is the temperature")) is None
+    assert matcher.misses == 1
+
+
+def test_invalid_second_domain_calls_nothing():
+    ha_service = _HaService(invalid={"fan"})
+    matcher = FastPathMatcher(ha_service)
+    _two_domains(matcher)
+
+    assert asyncio.run(matcher.async_handle("turn on the kitchen")) is None
+    assert ha_service.called == []
+    assert matcher.misses == 1
+
+
+def test_failed_second_domain_answers_partially():
+    ha_service = _HaService(failing={"fan"})
+    matcher = FastPathMatcher(ha_service)
+    _two_domains(matcher)
+
+    # Handing over to the LLM now would switch the light again
+    speech = asyncio.run(matcher.async_handle("turn on the kitchen"))
+    assert speech == "Turned on Kitchen light, but could not turn on Kitchen fan."
+    assert ha_service.called == [("light", "turn_on", [KITCHEN_LIGHT])]
+    assert matcher.hits == 1
+
+
+def test_nothing_done_goes_to_the_llm():
+    ha_service = _HaService(failing={"light", "fan"})
+    matcher = FastPathMatcher(ha_service)
+    _two_domains(matcher)
+
+    assert asyncio.run(matcher.async_handle("turn on the kitchen")) is None
+    assert matcher.misses == 1
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("homeassistant")
+pytest.importorskip("langchain")
+
+from custom_components.llm_conversation_assist.langchain_tools.memory import (
+    ConversationTokenBudgetMemory,
+    count_message_tokens,
+)
+from custom_components.llm_conversation_assist.token_counter import TRUNCATED_MARK, estimate_tokens
+
+
+def _memory(budget: int) -> ConversationTokenBudgetMemory:
+    return ConversationTokenBudgetMemory(
+        return_messages=True, memory_key="chat_history", input_key="input", max_token_limit=budget
+    )
+
+
+def _history(memory: ConversationTokenBudgetMemory):
+    return memory.load_memory_variables({})["chat_history"]
+
+
+def test_history_within_budget_is_kept():
+    memory = _memory(100)
+    memory.save_context({"input": "turn on the light"}, {"output": "The light is on."})
+    assert [message.content for message in _history(memory)] == ["turn on the light", "The light is on."]
+
+
+def test_oversized_message_is_truncated_before_dropping():
+    memory = _memory(100)
+    memory.save_context({"input": "list all devices"}, {"output": "x" * 1000})
+
+    history = _history(memory)
+    assert len(history) == 2
+    assert history[0].content == "list all devices"
+    assert history[1].content.endswith(TRUNCATED_MARK)
+    # No single message may take more than half of the budget
+    assert estimate_tokens(history[1].content) <= 50
+    assert count_message_tokens(history) <= 100
+
+
+def test_oldest_messages_are_dropped():
+    memory = _memory(20)
+    for turn in range(5):
+        # 10 tokens each, under the per-message share, so nothing is truncated
+        memory.save_context({"input": str(turn) * 40}, {"output": chr(ord("a") + turn) * 40})
+
+    history = _history(memory)
+    assert [message.content for message in history] == ["4" * 40, "e" * 40]
+    assert count_message_tokens(history) <= 20
+
+
+def test_lowering_the_budget_prunes_on_demand():
+    memory = _memory(1000)
+    for turn in range(5):
+        memory.save_context({"input": "a" * 40}, {"output": "b" * 40})
+    assert len(_history(memory)) == 10
+
+    memory.max_token_limit = 40
+    memory.prune()
+    assert len(_history(memory)) == 4
@@ -0,0 +1,50 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("homeassistant")
+pytest.importorskip("langchain")
+
+from homeassistant.core import Service
+from langchain.schema.messages import HumanMessage
+
+from custom_components.llm_conversation_assist.const import TRACING_MODE_FULL, TRACING_MODE_SAMPLED
+from custom_components.llm_conversation_assist.langchain_tools.tracing import TraceBuffer, TurnTracer
+from custom_components.llm_conversation_assist.metrics import Metrics
+
+
+def _run_tool(tracer: TurnTracer, output) -> None:
+    async def run():
+        run_id = uuid4()
+        await tracer.on_chat_model_start({}, [[HumanMessage(content="turn on the light")]], run_id=uuid4())
+        await tracer.on_tool_start({"name": "get_available_services"}, "light", run_id=run_id)
+        await tracer.on_tool_end(output, run_id=run_id)
+
+    asyncio.run(run())
+
+
+def test_full_trace_is_json_serializable():
+    buffer = TraceBuffer()
+    tracer = TurnTracer(Metrics(), buffer.start_turn(TRACING_MODE_FULL, "conversation", "turn on the light"))
+    # What get_available_services returns
+    _run_tool(tracer, {"light": {"turn_on": Service(lambda call: None, None, "light", "turn_on")}})
+
+    traces = json.loads(json.dumps(buffer.as_dict()))
+    tool_end = traces[0]["events"][-1]
+    assert tool_end["event"] == "tool_end"
+    assert "turn_on" in tool_end["output"]
+    assert traces[0]["events"][0]["messages"] == [[{"type": "human", "content": "turn on the light"}]]
+
+
+def test_sampled_trace_keeps_sizes_only():
+    buffer = TraceBuffer()
+    tracer = TurnTracer(Metrics(), buffer.start_turn(TRACING_MODE_SAMPLED, "conversation", "turn on the light"))
+    _run_tool(tracer, "light.kitchen is on")
+
+    trace = json.loads(json.dumps(buffer.as_dict()))[0]
+    assert trace["text"] is None
+    assert trace["events"][-1] == {
+        "at_ms": trace["events"][-1]["at_ms"], "event": "tool_end", "output_chars": len("light.kitchen is on")
+    }
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.llm_conversation_assist import yaml_cache
+from custom_components.llm_conversation_assist.yaml_cache import YamlFileCache
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "automations.yaml"
+    path.write_text("- id: '1'\n  alias: first\n", encoding="utf-8")
+    return str(path)
+
+
+def _touch(path: str, seconds: int) -> None:
+    # mtime resolution differs between file systems, move it explicitly
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_unchanged_file_is_parsed_once(config_file):
+    cache = YamlFileCache()
+    first = cache.read(config_file)
+    assert first == [{"id": "1", "alias": "first"}]
+    assert cache.read(config_file) is first
+
+
+def test_external_edit_is_parsed_again(config_file):
+    cache = YamlFileCache()
+    first = cache.read(config_file)
+    with open(config_file, "w", encoding="utf-8") as file:
+        file.write("- id: '1'\n  alias: edited\n")
+    _touch(config_file, 1)
+
+    second = cache.read(config_file)
+    assert second is not first
+    assert second == [{"id": "1", "alias": "edited"}]
+
+
+def test_same_size_edit_with_new_mtime_is_parsed_again(config_file):
+    cache = YamlFileCache()
+    cache.read(config_file)
+    with open(config_file, "w", encoding="utf-8") as file:
+        file.write("- id: '2'\n  alias: first\n")
+    _touch(config_file, 1)
+
+    assert cache.read(config_file) == [{"id": "2", "alias": "first"}]
+
+
+def test_written_document_is_kept(config_file):
+    cache = YamlFileCache()
+    document = cache.read(config_file)
+    document.append({"id": "2", "alias": "second"})
+    cache.write(config_file, document)
+
+    assert cache.read(config_file) is document
+    assert YamlFileCache().read(config_file) == document
+
+
+def test_missing_file(tmp_path, config_file):
+    cache = YamlFileCache()
+    assert cache.read(str(tmp_path / "missing.yaml")) is None
+    cache.read(config_file)
+    os.remove(config_file)
+    assert cache.read(config_file) is None
+
+
+def test_failed_dump_does_not_keep_modified_document(config_file, monkeypatch):
+    cache = YamlFileCache()
+    document = cache.read(config_file)
+    document.append({"id": "2", "alias": "not written"})
+
+    def fail(data):
+        raise ValueError("can't dump")
+
+    monkeypatch.setattr(yaml_cache, "dump", fail)
+    with pytest.raises(ValueError):
+        cache.write(config_file, document)
+
+    assert cache.read(config_file) == [{"id": "1", "alias": "first"}]
+
+
+def test_failed_write_does_not_keep_modified_document(config_file, monkeypatch):
+    cache = YamlFileCache()
+    document = cache.read(config_file)
+    document.append({"id": "2", "alias": "not written"})
+
+    def fail(path, contents):
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(yaml_cache, "write_utf8_file_atomic", fail)
+    with pytest.raises(OSError):
+        cache.write(config_file, document)
+
+    assert cache.read(config_file) == [{"id": "1", "alias": "first"}]